@@ -0,0 +1,61 @@
+"""Analytics module for vectorized SPC computations."""
+
+from .correlation import (
+    average_ranks,
+    correlation_matrix,
+    least_squares_by_group,
+    finite_or_none,
+    matrix_to_lists,
+)
+from .control_charts import (
+    CHART_TYPES,
+    estimate_sigma,
+    ewma,
+    reflected_cusum,
+    imr_chart,
+    ewma_chart,
+    cusum_chart,
+    group_bounds,
+)
+from .change_points import robust_sigma, split_gains, binary_segmentation
+from .distributions import betainc, gammaincc, f_sf, t_sf_two_sided, chi2_sf
+from .tool_matching import (
+    group_moments,
+    one_way_anova,
+    kruskal_wallis,
+    welch_test,
+    holm_adjust,
+    pairwise_offsets,
+    fleet_offsets,
+)
+
+__all__ = [
+    "average_ranks",
+    "correlation_matrix",
+    "least_squares_by_group",
+    "finite_or_none",
+    "matrix_to_lists",
+    "CHART_TYPES",
+    "estimate_sigma",
+    "ewma",
+    "reflected_cusum",
+    "imr_chart",
+    "ewma_chart",
+    "cusum_chart",
+    "group_bounds",
+    "robust_sigma",
+    "split_gains",
+    "binary_segmentation",
+    "betainc",
+    "gammaincc",
+    "f_sf",
+    "t_sf_two_sided",
+    "chi2_sf",
+    "group_moments",
+    "one_way_anova",
+    "kruskal_wallis",
+    "welch_test",
+    "holm_adjust",
+    "pairwise_offsets",
+    "fleet_offsets",
+]
@@ -0,0 +1,68 @@
+"""Vectorized correlation and least-squares helpers for SPC metrics."""
+
+from typing import Dict, List, Optional
+import numpy as np
+
+
+def average_ranks(values: np.ndarray) -> np.ndarray:
+    """Rank values from 1..n, giving tied values the average of their ranks."""
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    upper = np.cumsum(counts)
+    return (upper - (counts - 1) / 2.0)[inverse]
+
+
+def correlation_matrix(matrix: np.ndarray, method: str = "pearson") -> np.ndarray:
+    """
+    Correlation matrix of the columns of an (n_samples, n_metrics) array.
+
+    Spearman is computed as Pearson over average ranks. Constant columns
+    produce NaN correlations.
+    """
+    if method == "spearman":
+        matrix = np.column_stack([average_ranks(col) for col in matrix.T])
+
+    centered = matrix - matrix.mean(axis=0)
+    norms = np.sqrt((centered**2).sum(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = (centered.T @ centered) / np.outer(norms, norms)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def least_squares_by_group(
+    x: np.ndarray, y: np.ndarray, group_codes: np.ndarray, n_groups: int
+) -> Dict[str, np.ndarray]:
+    """
+    Fit y = slope * x + intercept independently for every group in one pass.
+
+    Sufficient statistics are accumulated with bincount, so the cost is linear
+    in the number of samples regardless of the number of groups.
+    """
+    n = np.bincount(group_codes, minlength=n_groups).astype(float)
+    sx = np.bincount(group_codes, weights=x, minlength=n_groups)
+    sy = np.bincount(group_codes, weights=y, minlength=n_groups)
+    sxx = np.bincount(group_codes, weights=x * x, minlength=n_groups)
+    syy = np.bincount(group_codes, weights=y * y, minlength=n_groups)
+    sxy = np.bincount(group_codes, weights=x * y, minlength=n_groups)
+
+    var_x = n * sxx - sx**2
+    var_y = n * syy - sy**2
+    cov_xy = n * sxy - sx * sy
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = cov_xy / var_x
+        intercept = (sy - slope * sx) / n
+        r_squared = cov_xy**2 / (var_x * var_y)
+
+    return {"n": n, "slope": slope, "intercept": intercept, "r_squared": r_squared}
+
+
+def finite_or_none(value: float, digits: int = 6) -> Optional[float]:
+    """Round a float for JSON output, mapping NaN/inf to None."""
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def matrix_to_lists(matrix: np.ndarray, digits: int = 6) -> List[List[Optional[float]]]:
+    """Convert a matrix to nested lists with NaN mapped to None."""
+    return [[finite_or_none(v, digits) for v in row] for row in matrix]
@@ -0,0 +1,129 @@
+"""Tool-to-tool matching tests computed from per-entity aggregates."""
+
+from itertools import combinations
+from typing import Dict, List
+import numpy as np
+from .distributions import f_sf, t_sf_two_sided, chi2_sf
+
+
+def group_moments(n: np.ndarray, total: np.ndarray, total_sq: np.ndarray) -> Dict:
+    """Means and sample variances from counts, sums and sums of squares."""
+    n = n.astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / n
+        variance = np.maximum(total_sq - total * mean, 0.0) / (n - 1)
+    return {"n": n, "mean": mean, "variance": np.where(n > 1, variance, np.nan)}
+
+
+def one_way_anova(n: np.ndarray, total: np.ndarray, total_sq: np.ndarray) -> Dict:
+    """One-way ANOVA F test of equal means across groups."""
+    groups, count = len(n), float(n.sum())
+    df_between, df_within = groups - 1, count - groups
+    if df_between < 1 or df_within < 1:
+        return {"statistic": np.nan, "df": [df_between, df_within], "p_value": np.nan}
+
+    moments = group_moments(n, total, total_sq)
+    grand_mean = total.sum() / count
+    between = float((moments["n"] * (moments["mean"] - grand_mean) ** 2).sum())
+    within = float(np.maximum(total_sq - total * moments["mean"], 0.0).sum())
+
+    if within > 0:
+        f = (between / df_between) / (within / df_within)
+    else:
+        f = np.inf if between > 0 else np.nan
+    p_value = f_sf(f, df_between, df_within) if not np.isnan(f) else np.nan
+    return {"statistic": f, "df": [df_between, df_within], "p_value": p_value}
+
+
+def kruskal_wallis(n: np.ndarray, rank_sum: np.ndarray, tie_term: float) -> Dict:
+    """
+    Kruskal-Wallis H test from per-group counts and sums of average ranks.
+    tie_term is the sum of t^3 - t over groups of tied values.
+    """
+    groups, count = len(n), float(n.sum())
+    if groups < 2 or count < 2:
+        return {"statistic": np.nan, "df": [groups - 1], "p_value": np.nan}
+
+    h = 12.0 / (count * (count + 1)) * float((rank_sum**2 / n).sum())
+    h -= 3.0 * (count + 1)
+    correction = 1.0 - tie_term / (count**3 - count)
+    if correction <= 0:
+        return {"statistic": np.nan, "df": [groups - 1], "p_value": np.nan}
+
+    h /= correction
+    return {"statistic": h, "df": [groups - 1], "p_value": chi2_sf(h, groups - 1)}
+
+
+def welch_test(n_a, mean_a, var_a, n_b, mean_b, var_b) -> Dict:
+    """Welch t test of equal means for two groups with unequal variances."""
+    offset = mean_a - mean_b
+    se_a, se_b = var_a / n_a, var_b / n_b
+    se = np.sqrt(se_a + se_b)
+    if not np.isfinite(se) or se == 0:
+        return {"offset": offset, "t": np.nan, "df": np.nan, "p_value": np.nan}
+
+    t = offset / se
+    df = (se_a + se_b) ** 2 / (se_a**2 / (n_a - 1) + se_b**2 / (n_b - 1))
+    return {"offset": offset, "t": t, "df": df, "p_value": t_sf_two_sided(t, df)}
+
+
+def holm_adjust(p_values: List[float]) -> List[float]:
+    """Holm-Bonferroni adjusted p-values, leaving NaN entries untouched."""
+    p = np.asarray(p_values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(p))
+    adjusted = p.copy()
+    if len(valid) == 0:
+        return adjusted.tolist()
+
+    order = valid[np.argsort(p[valid])]
+    factors = len(valid) - np.arange(len(valid))
+    stepped = np.maximum.accumulate(np.minimum(p[order] * factors, 1.0))
+    adjusted[order] = stepped
+    return adjusted.tolist()
+
+
+def pairwise_offsets(
+    labels: List[str], n: np.ndarray, total: np.ndarray, total_sq: np.ndarray
+) -> List[Dict]:
+    """Welch tests for every pair of groups, with Holm-adjusted p-values."""
+    moments = group_moments(n, total, total_sq)
+    results = []
+    for i, j in combinations(range(len(labels)), 2):
+        test = welch_test(
+            moments["n"][i],
+            moments["mean"][i],
+            moments["variance"][i],
+            moments["n"][j],
+            moments["mean"][j],
+            moments["variance"][j],
+        )
+        results.append({"entity_a": labels[i], "entity_b": labels[j], **test})
+
+    adjusted = holm_adjust([r["p_value"] for r in results])
+    for result, p_adjusted in zip(results, adjusted):
+        result["p_adjusted"] = p_adjusted
+    return results
+
+
+def fleet_offsets(
+    labels: List[str], n: np.ndarray, total: np.ndarray, total_sq: np.ndarray
+) -> List[Dict]:
+    """Welch test of each group against all other groups pooled."""
+    moments = group_moments(n, total, total_sq)
+    rest = group_moments(n.sum() - n, total.sum() - total, total_sq.sum() - total_sq)
+    results = []
+    for i, label in enumerate(labels):
+        test = welch_test(
+            moments["n"][i],
+            moments["mean"][i],
+            moments["variance"][i],
+            rest["n"][i],
+            rest["mean"][i],
+            rest["variance"][i],
+        )
+        results.append({"entity_a": label, "entity_b": "FLEET", **test})
+
+    adjusted = holm_adjust([r["p_value"] for r in results])
+    for result, p_adjusted in zip(results, adjusted):
+        result["p_adjusted"] = p_adjusted
+    return results
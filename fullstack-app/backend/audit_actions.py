@@ -0,0 +1,89 @@
+"""
+Lookup of the distinct audit actions.
+
+Only a few dozen action names exist, however many audit rows there are. They
+are loaded with a skip scan over the (action, created_at) index, which reads
+one index entry per action instead of every row, and cached per worker.
+Substring searches are resolved against this small set, so the audit query
+filters on action IN (...) and can use the index instead of LIKE '%x%'.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from config import settings
+from models import AuditLog
+
+# Actions as routers/auth.py logs them. Failed logins are login_attempt rows
+# without a user_id; registrations are registration_request (accepted) or
+# registration_attempt (rejected).
+LOGIN_ACTIONS = ("login", "login_attempt")
+REGISTRATION_ACTIONS = ("registration_request", "registration_attempt")
+# Recursive CTE that jumps from one action to the next through the index
+SKIP_SCAN_SQL = text("""
+    WITH RECURSIVE actions(name) AS (
+        (SELECT action FROM audit_logs ORDER BY action LIMIT 1)
+        UNION ALL
+        SELECT (
+            SELECT action FROM audit_logs
+            WHERE action > actions.name ORDER BY action LIMIT 1
+        )
+        FROM actions WHERE actions.name IS NOT NULL
+    )
+    SELECT name FROM actions WHERE name IS NOT NULL
+    """)
+
+
+class AuditActions:
+    """Cached set of audit action names with a TTL."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._names: Optional[Set[str]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "loads": 0}
+
+    def _load(self, db: Session) -> Set[str]:
+        if db.get_bind().dialect.name == "postgresql":
+            return set(db.execute(SKIP_SCAN_SQL).scalars())
+        return {name for (name,) in db.query(AuditLog.action).distinct()}
+
+    def names(self, db: Session) -> List[str]:
+        with self._lock:
+            if (
+                self._names is not None
+                and time.monotonic() - self._loaded_at < self.ttl_seconds
+            ):
+                self._counters["hits"] += 1
+                return sorted(self._names)
+
+        names = self._load(db)
+        with self._lock:
+            self._names = names
+            self._loaded_at = time.monotonic()
+            self._counters["loads"] += 1
+        return sorted(names)
+
+    def matching(self, db: Session, fragment: str) -> List[str]:
+        """Action names containing fragment (case-insensitive)."""
+        fragment = fragment.lower()
+        return [name for name in self.names(db) if fragment in name.lower()]
+
+    def note(self, action: str):
+        """Record an action as it is logged, so it is searchable immediately."""
+        with self._lock:
+            if self._names is not None:
+                self._names.add(action)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "actions": len(self._names) if self._names is not None else 0,
+            }
+
+
+audit_actions = AuditActions(ttl_seconds=settings.audit_actions_ttl_seconds)
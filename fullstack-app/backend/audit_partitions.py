@@ -0,0 +1,327 @@
+"""
+Monthly partitions, retention and archival for audit_logs.
+
+audit_logs is range-partitioned by month on created_at (see
+scripts/partition_audit_logs.py for existing databases), so the time-bounded
+audit and security queries only scan the partitions their window covers.
+Partitions are created AUDIT_PARTITIONS_AHEAD months in advance; a default
+partition catches anything outside them so writes never fail.
+
+Retention is opt-in. With AUDIT_RETENTION_DAYS set, months that ended more
+than that many days ago are exported to {AUDIT_ARCHIVE_DIR}/month=YYYY-MM/ as
+gzipped NDJSON or Parquet and then dropped. AUDIT_ARCHIVE_DIR must be set
+explicitly (and should be durable storage); without it nothing is archived or
+deleted. Expired rows in the default partition, or in a table that has not
+been partitioned yet, are removed with a ranged DELETE after the export.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import DateTime, func, select, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import SessionLocal
+from models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+TABLE = AuditLog.__tablename__
+DEFAULT_PARTITION = f"{TABLE}_default"
+ARCHIVE_FORMATS = ("ndjson", "parquet")
+BATCH_SIZE = 10_000
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(start: datetime) -> datetime:
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"{TABLE}_p{start:%Y_%m}"
+
+
+def _partition_month(name: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(name, f"{TABLE}_p%Y_%m").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"
+        ),
+        {"table": TABLE},
+    ).scalar()
+
+
+def list_partitions(db: Session) -> List[str]:
+    rows = db.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table ORDER BY c.relname"
+        ),
+        {"table": TABLE},
+    )
+    return [name for (name,) in rows]
+
+
+def create_partition(db: Session, start: datetime):
+    """
+    Create the partition for the month starting at start. Rows for that month
+    already in the default partition are moved into it.
+    """
+    end = _next_month(start)
+    name = partition_name(start)
+    bounds = {"start": start, "end": end}
+    has_default = DEFAULT_PARTITION in list_partitions(db)
+
+    if has_default:
+        db.execute(
+            text(
+                "CREATE TEMP TABLE audit_logs_moving ON COMMIT DROP AS "
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                "WHERE created_at >= :start AND created_at < :end RETURNING *) "
+                "SELECT * FROM moved"
+            ),
+            bounds,
+        )
+    db.execute(
+        text(
+            f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES "
+            f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    )
+    if has_default:
+        db.execute(text(f"INSERT INTO {TABLE} SELECT * FROM audit_logs_moving"))
+        db.execute(text("DROP TABLE audit_logs_moving"))
+
+
+def ensure_partitions(
+    db: Session, since: Optional[datetime] = None, commit: bool = True
+) -> List[str]:
+    """
+    Create missing monthly partitions from since (default: this month) through
+    AUDIT_PARTITIONS_AHEAD months ahead, plus the default partition. Returns
+    the partitions created; does nothing on an unpartitioned table.
+    """
+    if not is_partitioned(db):
+        return []
+
+    existing = set(list_partitions(db))
+    created = []
+    if DEFAULT_PARTITION not in existing:
+        db.execute(
+            text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+        )
+        created.append(DEFAULT_PARTITION)
+
+    now = datetime.now(timezone.utc)
+    start = _month_start(since or now)
+    last = _month_start(now)
+    for _ in range(settings.audit_partitions_ahead):
+        last = _next_month(last)
+
+    while start <= last:
+        if partition_name(start) not in existing:
+            create_partition(db, start)
+            created.append(partition_name(start))
+        start = _next_month(start)
+
+    if commit:
+        db.commit()
+    return created
+
+
+def _expired_months(db: Session, cutoff: datetime, partitioned: bool) -> List[Tuple]:
+    """
+    (month start, partition name or None) of months ending before cutoff.
+    Months without a partition of their own are those with rows in the
+    default partition, or every month of an unpartitioned table.
+    """
+    months = {}
+    if partitioned:
+        for name in list_partitions(db):
+            start = _partition_month(name)
+            if start is not None and _next_month(start) <= cutoff:
+                months[start] = name
+        starts = db.execute(
+            text(
+                "SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC') "
+                f"FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff"
+            ),
+            {"cutoff": cutoff},
+        ).scalars()
+    else:
+        month = func.date_trunc("month", AuditLog.created_at, type_=DateTime)
+        starts = (
+            start
+            for (start,) in db.query(month)
+            .filter(AuditLog.created_at < cutoff)
+            .distinct()
+        )
+
+    for start in starts:
+        start = start.replace(tzinfo=start.tzinfo or timezone.utc)
+        if _next_month(start) <= cutoff:
+            months.setdefault(start, None)
+    return sorted(months.items())
+
+
+def archive_path(start: datetime, archive_format: str) -> Path:
+    suffix = "ndjson.gz" if archive_format == "ndjson" else "parquet"
+    return (
+        Path(settings.audit_archive_dir) / f"month={start:%Y-%m}" / f"{TABLE}.{suffix}"
+    )
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _write_ndjson(result, path: Path) -> int:
+    written = 0
+    with gzip.open(path, "wt", encoding="utf-8") as archive:
+        for partition in result.partitions():
+            for row in partition:
+                archive.write(json.dumps(dict(row._mapping), default=_json_value))
+                archive.write("\n")
+            written += len(partition)
+    return written
+
+
+def _write_parquet(result, path: Path) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError(
+            "Parquet audit archives require pyarrow (pip install pyarrow)"
+        ) from e
+    from parquet_export import arrow_schema
+
+    schema = arrow_schema(pa, AuditLog)
+    written = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for partition in result.partitions():
+            rows = [
+                {
+                    **row._mapping,
+                    "ip_address": (
+                        str(row.ip_address) if row.ip_address is not None else None
+                    ),
+                    "details": (
+                        json.dumps(row.details) if row.details is not None else None
+                    ),
+                }
+                for row in partition
+            ]
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+            written += len(partition)
+    return written
+
+
+def export_month(db: Session, start: datetime, archive_format: str) -> Tuple[Path, int]:
+    """Write one month of audit_logs to its archive file. Returns (path, rows)."""
+    statement = (
+        select(AuditLog.__table__)
+        .where(AuditLog.created_at >= start, AuditLog.created_at < _next_month(start))
+        .order_by(AuditLog.created_at, AuditLog.id)
+    )
+    result = db.execute(statement, execution_options={"yield_per": BATCH_SIZE})
+
+    path = archive_path(start, archive_format)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    if archive_format == "parquet":
+        written = _write_parquet(result, tmp)
+    else:
+        written = _write_ndjson(result, tmp)
+    # An archive is only visible once complete
+    os.replace(tmp, path)
+    return path, written
+
+
+def archive_expired(db: Session, dry_run: bool = False) -> List[Dict[str, Any]]:
+    """
+    Export and drop every month older than the retention period. Returns one
+    entry per month with its archive path and row count.
+    """
+    if settings.audit_retention_days <= 0:
+        return []
+    if not settings.audit_archive_dir:
+        raise RuntimeError(
+            "AUDIT_RETENTION_DAYS is set but AUDIT_ARCHIVE_DIR is not; "
+            "refusing to delete audit logs without an archive location"
+        )
+    archive_format = settings.audit_archive_format
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"AUDIT_ARCHIVE_FORMAT must be one of {ARCHIVE_FORMATS}")
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.audit_retention_days)
+    partitioned = is_partitioned(db)
+    archived = []
+
+    for start, partition in _expired_months(db, cutoff, partitioned):
+        entry = {"month": f"{start:%Y-%m}", "partition": partition}
+        if dry_run:
+            archived.append(entry)
+            continue
+
+        path, rows = export_month(db, start, archive_format)
+        if partition is not None:
+            db.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {partition}"))
+            db.execute(text(f"DROP TABLE {partition}"))
+        # Rows of the month left in the default partition or an unpartitioned
+        # table; they were part of the export above
+        db.query(AuditLog).filter(
+            AuditLog.created_at >= start,
+            AuditLog.created_at < _next_month(start),
+        ).delete(synchronize_session=False)
+        # One month per transaction, so a failure never loses an exported month
+        db.commit()
+        archived.append({**entry, "path": str(path), "rows": rows})
+        logger.info(f"Archived {rows} audit rows for {start:%Y-%m} to {path}")
+
+    return archived
+
+
+def maintain(db: Session) -> Dict[str, Any]:
+    """Create upcoming partitions and archive expired months."""
+    return {"created": ensure_partitions(db), "archived": archive_expired(db)}
+
+
+async def run_forever():
+    """Background loop running partition maintenance on a fixed interval."""
+    while True:
+        db = SessionLocal()
+        try:
+            result = await run_in_threadpool(maintain, db)
+            if result["created"] or result["archived"]:
+                logger.info(f"Audit partition maintenance: {result}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Audit partition maintenance failed: {e}")
+        finally:
+            db.close()
+        await asyncio.sleep(settings.audit_maintenance_seconds)
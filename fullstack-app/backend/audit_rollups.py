@@ -0,0 +1,156 @@
+"""
+Hourly rollups of audit events for the audit statistics page.
+
+audit_log_rollup holds the event count per hour, action, outcome and user. A
+background job extends it from the last rolled-up hour, and statistics merge
+rollup rows for whole hours with raw audit rows for the partial hour at the
+start of the window and everything since the last rolled-up hour.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import DateTime, and_, func, insert, or_, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from audit_actions import LOGIN_ACTIONS, REGISTRATION_ACTIONS
+from database import SessionLocal, advisory_xact_lock
+from models import AuditLog, AuditLogRollup
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLUMNS = ["bucket_start", "action", "success", "user_id", "n"]
+
+# Batched audit writes can land shortly after their hour has been rolled up,
+# so each refresh recomputes this many hours before the newest one
+RECOMPUTE_HOURS = 1
+
+
+def _hour(column):
+    return func.date_trunc("hour", column, type_=DateTime(timezone=True))
+
+
+def get_rollup_cutoff(db: Session) -> Optional[datetime]:
+    """
+    Start of the newest rolled-up hour. Rollup rows before it are complete;
+    events from it onwards are read from audit_logs.
+    """
+    return db.query(func.max(AuditLogRollup.bucket_start)).scalar()
+
+
+def refresh_rollups(db: Session, full: bool = False) -> int:
+    """
+    Recompute rollup rows from shortly before the newest rolled-up hour, or
+    rebuild them entirely. Returns the number of rows written. Concurrent
+    refreshes wait for each other, so they never both insert the same hours.
+    """
+    advisory_xact_lock(db, AuditLogRollup.__tablename__)
+    since = None if full else get_rollup_cutoff(db)
+    if since is not None:
+        since -= timedelta(hours=RECOMPUTE_HOURS)
+
+    stale = db.query(AuditLogRollup)
+    if since is not None:
+        stale = stale.filter(AuditLogRollup.bucket_start >= since)
+    stale.delete(synchronize_session=False)
+
+    hour = _hour(AuditLog.created_at)
+    query = select(
+        hour, AuditLog.action, AuditLog.success, AuditLog.user_id, func.count()
+    ).group_by(hour, AuditLog.action, AuditLog.success, AuditLog.user_id)
+    if since is not None:
+        query = query.where(AuditLog.created_at >= since)
+
+    result = db.execute(insert(AuditLogRollup).from_select(ROLLUP_COLUMNS, query))
+    db.commit()
+    return result.rowcount
+
+
+def _counters(model, count) -> List:
+    """total, failed, login and registration counts as FILTER aggregates."""
+    return [
+        func.coalesce(count, 0),
+        func.coalesce(count.filter(model.success.is_(False)), 0),
+        func.coalesce(count.filter(model.action.in_(LOGIN_ACTIONS)), 0),
+        func.coalesce(count.filter(model.action.in_(REGISTRATION_ACTIONS)), 0),
+    ]
+
+
+def _window_sources(db: Session, start_date: datetime) -> List[Tuple]:
+    """
+    (model, count expression, filters) covering the window from start_date:
+    rollup rows for its whole hours, raw rows for the rest.
+    """
+    cutoff = get_rollup_cutoff(db)
+    # First whole hour of the window
+    first_hour = start_date.replace(minute=0, second=0, microsecond=0)
+    if first_hour < start_date:
+        first_hour += timedelta(hours=1)
+
+    if cutoff is None or cutoff <= first_hour:
+        return [(AuditLog, func.count(), [AuditLog.created_at >= start_date])]
+
+    return [
+        (
+            AuditLogRollup,
+            func.sum(AuditLogRollup.n),
+            [
+                AuditLogRollup.bucket_start >= first_hour,
+                AuditLogRollup.bucket_start < cutoff,
+            ],
+        ),
+        (
+            AuditLog,
+            func.count(),
+            [
+                AuditLog.created_at >= start_date,
+                or_(AuditLog.created_at < first_hour, AuditLog.created_at >= cutoff),
+            ],
+        ),
+    ]
+
+
+def audit_stats(db: Session, start_date: datetime) -> Dict[str, Any]:
+    """
+    Event counters and per-user event counts since start_date. Each source is
+    read with one FILTER aggregate and one per-user aggregate.
+    """
+    totals = [0, 0, 0, 0]
+    user_counts: Dict[int, int] = {}
+
+    for model, count, filters in _window_sources(db, start_date):
+        row = db.query(*_counters(model, count)).filter(and_(*filters)).one()
+        totals = [total + int(value) for total, value in zip(totals, row)]
+
+        users = (
+            db.query(model.user_id, count)
+            .filter(and_(model.user_id.isnot(None), *filters))
+            .group_by(model.user_id)
+        )
+        for user_id, value in users:
+            user_counts[user_id] = user_counts.get(user_id, 0) + int(value)
+
+    total, failed, logins, registrations = totals
+    return {
+        "total_logs": total,
+        "failed_attempts": failed,
+        "login_attempts": logins,
+        "registration_attempts": registrations,
+        "user_counts": user_counts,
+    }
+
+
+async def run_forever():
+    """Background loop extending the hourly audit rollups on a fixed interval."""
+    while True:
+        db = SessionLocal()
+        try:
+            await run_in_threadpool(refresh_rollups, db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Audit rollup refresh failed: {e}")
+        finally:
+            db.close()
+        await asyncio.sleep(settings.audit_rollup_refresh_seconds)
@@ -0,0 +1,152 @@
+"""
+Batched audit-log writer.
+
+While its background loop runs, create_audit_log hands events to this sink
+instead of committing them on the request path. Events are stamped when they
+are queued and flushed every AUDIT_FLUSH_SECONDS as multi-row INSERTs of up
+to AUDIT_BATCH_SIZE rows. The queue holds at most AUDIT_QUEUE_MAX events;
+beyond that, callers write synchronously. If a batch fails, its rows are
+retried one at a time so a single bad row cannot take the others with it;
+rows that still fail are logged in full and counted as lost. The lifespan
+flushes whatever is left on shutdown. Without background tasks (Lambda,
+scripts), the sink is not running and events are written directly.
+
+Queued events are committed by the sink, not in the transaction of the
+request that logged them.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import SessionLocal
+from models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditSink:
+    """Bounded in-memory queue of audit rows flushed in batches."""
+
+    def __init__(self, max_queue: int, batch_size: int):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        # Serializes flushes from the loop and the shutdown hook
+        self._flush_lock = threading.Lock()
+        self._running = False
+        self._counters = {
+            "queued": 0,
+            "written": 0,
+            "batches": 0,
+            "overflow": 0,
+            "failed_batches": 0,
+            "retried_rows": 0,
+            "lost": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def offer(self, row: Dict[str, Any]) -> bool:
+        """Queue an audit row. Returns False if the caller must write it."""
+        with self._lock:
+            if not self._running:
+                return False
+            if len(self._queue) >= self.max_queue:
+                self._counters["overflow"] += 1
+                return False
+            self._queue.append(row)
+            self._counters["queued"] += 1
+            return True
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def flush(self) -> int:
+        """Write all queued rows in batches. Returns the number written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return written
+
+                db = SessionLocal()
+                try:
+                    # executemany renders multi-row INSERT ... VALUES batches
+                    db.execute(insert(AuditLog), batch)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    self._counters["failed_batches"] += 1
+                    logger.error(
+                        f"Audit batch of {len(batch)} rows failed, "
+                        f"retrying row by row: {e}"
+                    )
+                    written += self._write_rows(db, batch)
+                    continue
+                finally:
+                    db.close()
+
+                written += len(batch)
+                self._counters["written"] += len(batch)
+                self._counters["batches"] += 1
+
+    def _write_rows(self, db, rows: List[Dict[str, Any]]) -> int:
+        """Write rows one transaction each. Returns the number written."""
+        written = 0
+        for row in rows:
+            self._counters["retried_rows"] += 1
+            try:
+                db.execute(insert(AuditLog), [row])
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self._counters["lost"] += 1
+                logger.error(f"Audit row lost: {row}: {e}")
+                continue
+            written += 1
+            self._counters["written"] += 1
+        return written
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "running": self._running,
+                "pending": len(self._queue),
+                "max_queue": self.max_queue,
+            }
+
+    async def run_forever(self):
+        """Background loop flushing queued rows on a fixed interval."""
+        self._running = True
+        try:
+            while True:
+                await asyncio.sleep(settings.audit_flush_seconds)
+                try:
+                    await run_in_threadpool(self.flush)
+                except Exception as e:
+                    logger.error(f"Audit flush failed: {e}")
+        finally:
+            self._running = False
+
+    async def shutdown(self):
+        """Stop queueing and write out pending rows."""
+        self._running = False
+        await run_in_threadpool(self.flush)
+
+
+audit_sink = AuditSink(
+    max_queue=settings.audit_queue_max,
+    batch_size=settings.audit_batch_size,
+)
@@ -2,6 +2,7 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -9,6 +10,12 @@ import secrets
 from models import User, RefreshToken, AuditLog, BlacklistedToken
 from database import get_db
 from config import settings
+from principal_cache import principal_cache
+from token_versions import token_versions
+from password_hashing import password_hasher, PasswordHasherBusy
+from audit_sink import audit_sink
+from audit_actions import audit_actions
+from security.monitoring import security_detector
 
 # Password hashing configuration using Argon2id
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
@@ -29,8 +36,24 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 
 def get_password_hash(password: str) -> str:
-    """Hash a password using Argon2id."""
-    return pwd_context.hash(password)
+    """Hash a password using Argon2id with the current cost parameters."""
+    return password_hasher.hash_sync(password)
+
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent sign-in requests, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the hashing executor, off the event loop."""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -74,8 +97,16 @@ def verify_token(token: str, token_type: str, db: Optional[Session] = None) -> d
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token type"
             )
 
-        # Check if token is blacklisted (if db session provided)
-        if db and "jti" in payload:
+        # Tokens carrying a version are revoked by bumping the user's version
+        if db and "ver" in payload:
+            if token_versions.is_revoked(db, payload):
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token has been revoked",
+                )
+
+        # Older tokens fall back to the blacklist (if db session provided)
+        elif db and "jti" in payload:
             blacklisted = (
                 db.query(BlacklistedToken)
                 .filter(BlacklistedToken.token_jti == payload["jti"])
@@ -95,13 +126,18 @@ def verify_token(token: str, token_type: str, db: Optional[Session] = None) -> d
         )
 
 
-def blacklist_token(db: Session, token: str, user_id: int, reason: str = "logout"):
+def blacklist_token(
+    db: Session, token: str, user_id: int, reason: str = "logout", commit: bool = True
+):
     """Add a token to the blacklist."""
+    principal_cache.invalidate_token(token)
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         jti = payload.get("jti")
         if not jti:
             return  # Old token without JTI, skip
+        if "ver" in payload:
+            return  # Revoked through the user's token version instead
 
         # Check if already blacklisted
         existing = (
@@ -119,30 +155,56 @@ def blacklist_token(db: Session, token: str, user_id: int, reason: str = "logout
             reason=reason,
         )
         db.add(blacklisted)
-        db.commit()
+        if commit:
+            db.commit()
     except Exception:
         # Silently fail - don't break logout if blacklisting fails
         pass
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    """Authenticate a user by email and password."""
+def revoke_user_tokens(db: Session, user_id: int, commit: bool = True):
+    """Revoke every access and refresh token issued to a user so far."""
+    token_versions.bump(db, user_id, commit=commit)
+    principal_cache.invalidate_user(user_id)
+
+
+async def authenticate_user(
+    db: Session, email: str, password: str, commit: bool = True
+) -> Optional[User]:
+    """
+    Authenticate a user by email and password. Verification runs in the
+    hashing executor; hashes made with weaker parameters are replaced.
+    """
     user = db.query(User).filter(User.email == email).first()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    try:
+        valid, new_hash = await password_hasher.verify(password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    if not valid:
         return None
     if not user.is_active:
         return None
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        if commit:
+            db.commit()
     return user
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-) -> User:
-    """Get the current authenticated user from JWT token."""
-    token = credentials.credentials
+def resolve_principal(token: str, db: Session) -> User:
+    """
+    Resolve an access token to its active user, from the principal cache when
+    possible. Raises 401 for invalid or revoked tokens and inactive users.
+    """
+    cached = principal_cache.get(token)
+    if cached is not None:
+        payload, user = cached
+        if "ver" not in payload or not token_versions.is_revoked(db, payload):
+            return user
+        principal_cache.invalidate_token(token)
+
     payload = verify_token(token, "access", db)
 
     user_id = payload.get("sub")
@@ -163,9 +225,18 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive user"
         )
 
+    principal_cache.set(token, payload, user)
     return user
 
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+) -> User:
+    """Get the current authenticated user from JWT token."""
+    return resolve_principal(credentials.credentials, db)
+
+
 async def get_current_active_superuser(
     current_user: User = Depends(get_current_user),
 ) -> User:
@@ -186,18 +257,7 @@ async def get_current_user_optional(
         return None
 
     try:
-        token = credentials.credentials
-        payload = verify_token(token, "access", db)
-
-        user_id = payload.get("sub")
-        if user_id is None:
-            return None
-
-        user = db.query(User).filter(User.id == user_id).first()
-        if user is None or not user.is_active:
-            return None
-
-        return user
+        return resolve_principal(credentials.credentials, db)
     except Exception:
         return None
 
@@ -210,45 +270,95 @@ def create_audit_log(
     success: bool,
     request: Optional[Request] = None,
     details: Optional[dict] = None,
+    commit: bool = True,
 ):
-    """Create an audit log entry."""
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        resource=resource,
-        success=success,
-        ip_address=request.client.host if request else None,
-        user_agent=request.headers.get("user-agent") if request else None,
-        details=details,
-    )
+    """
+    Create an audit log entry. It is queued for a batched write when the
+    audit sink is running; otherwise it is added to the session, and with
+    commit=False it joins the caller's transaction.
+    """
+    row = {
+        "user_id": user_id,
+        "action": action,
+        "resource": resource,
+        "success": success,
+        "ip_address": request.client.host if request else None,
+        "user_agent": request.headers.get("user-agent") if request else None,
+        "details": details,
+        "created_at": datetime.now(timezone.utc),
+    }
+    audit_log = AuditLog(**row)
+    audit_actions.note(action)
+    security_detector.observe(row)
+    if audit_sink.offer(row):
+        return audit_log
+
     db.add(audit_log)
-    db.commit()
+    if commit:
+        db.commit()
     return audit_log
 
 
-def save_refresh_token(db: Session, user_id: int, token: str, expires_at: datetime):
+def save_refresh_token(
+    db: Session, user_id: int, token: str, expires_at: datetime, commit: bool = True
+):
     """Save a refresh token to the database."""
     refresh_token = RefreshToken(user_id=user_id, token=token, expires_at=expires_at)
     db.add(refresh_token)
-    db.commit()
+    if commit:
+        db.commit()
     return refresh_token
 
 
+def rotate_refresh_token(
+    db: Session, user_id: int, old_token: str, new_token: str, expires_at: datetime
+) -> bool:
+    """
+    Replace a stored, unexpired refresh token of an active user with a new
+    one in a single UPDATE ... RETURNING. Returns False if no such token
+    exists. The caller commits.
+    """
+    rotated = db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token == old_token,
+            RefreshToken.user_id == user_id,
+            RefreshToken.expires_at > datetime.now(timezone.utc),
+            RefreshToken.user_id == User.id,
+            User.is_active.is_(True),
+        )
+        .values(token=new_token, expires_at=expires_at)
+        .returning(RefreshToken.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    return rotated is not None
+
+
 def invalidate_refresh_token(db: Session, token: str):
     """Invalidate a refresh token by removing it from the database."""
     db.query(RefreshToken).filter(RefreshToken.token == token).delete()
     db.commit()
 
 
-def invalidate_all_user_tokens(db: Session, user_id: int):
+def invalidate_all_user_tokens(db: Session, user_id: int, commit: bool = True):
     """Invalidate all refresh tokens for a user."""
+    principal_cache.invalidate_user(user_id)
     db.query(RefreshToken).filter(RefreshToken.user_id == user_id).delete()
-    db.commit()
+    if commit:
+        db.commit()
 
 
-def clean_expired_tokens(db: Session):
-    """Remove expired refresh tokens from the database."""
-    db.query(RefreshToken).filter(
-        RefreshToken.expires_at < datetime.now(timezone.utc)
-    ).delete()
+def clean_expired_tokens(db: Session) -> dict:
+    """Remove expired refresh tokens and blacklist entries from the database."""
+    now = datetime.now(timezone.utc)
+    removed = {
+        "refresh_tokens": db.query(RefreshToken)
+        .filter(RefreshToken.expires_at < now)
+        .delete(),
+        # A blacklisted token that has expired is rejected on its own
+        "blacklisted_tokens": db.query(BlacklistedToken)
+        .filter(BlacklistedToken.expires_at < now)
+        .delete(),
+    }
     db.commit()
+    return removed
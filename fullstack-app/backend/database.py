@@ -1,15 +1,90 @@
-from sqlalchemy import create_engine
+import time
+import logging
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 engine = create_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional read replica for analytical reads. Without one, reads use the primary.
+replica_engine = (
+    create_engine(settings.database_replica_url, pool_pre_ping=True)
+    if settings.database_replica_url
+    else None
+)
+ReadSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if replica_engine is not None
+    else SessionLocal
+)
+
 Base = declarative_base()
 
+# Header a caller sets to bound how stale a replica read may be, in seconds
+MAX_STALENESS_HEADER = "X-Max-Staleness"
+
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+_replica_lag = {"value": None, "checked_at": 0.0}
+
+
+def get_replica_lag() -> Optional[float]:
+    """
+    Replication lag of the replica in seconds, cached briefly so that the
+    check itself does not add a round trip to every request. Returns None
+    if the replica cannot be reached.
+    """
+    now = time.monotonic()
+    if now - _replica_lag["checked_at"] < settings.replica_lag_check_seconds:
+        return _replica_lag["value"]
+
+    try:
+        with replica_engine.connect() as conn:
+            lag = float(conn.execute(REPLICA_LAG_SQL).scalar() or 0)
+    except Exception as e:
+        logger.warning(f"Replica lag check failed, using primary: {e}")
+        lag = None
+
+    _replica_lag.update(value=lag, checked_at=now)
+    return lag
+
+
+def _parse_max_staleness(request: Request) -> Optional[float]:
+    value = request.headers.get(MAX_STALENESS_HEADER)
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
+
+
+def use_replica(request: Request) -> bool:
+    """Decide whether a read-only request can be served by the replica."""
+    if replica_engine is None:
+        return False
+
+    lag = get_replica_lag()
+    if lag is None:
+        return False
+
+    max_staleness = _parse_max_staleness(request)
+    if max_staleness is not None and lag > max_staleness:
+        return False
+
+    return True
+
 
 def get_db():
     db = SessionLocal()
@@ -17,3 +92,37 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def bind_name(db: Session) -> str:
+    """Which engine db is bound to: "primary" or "replica"."""
+    return "primary" if db.get_bind() is engine else "replica"
+
+
+def session_factory_for(db: Session):
+    """Session factory bound to the same engine (primary or replica) as db."""
+    return SessionLocal if db.get_bind() is engine else ReadSessionLocal
+
+
+def advisory_xact_lock(db: Session, name: str):
+    """
+    Take a PostgreSQL advisory lock on name, held until db's transaction ends,
+    so jobs that rewrite the same rows run one at a time. A no-op elsewhere.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": name}
+        )
+
+
+def get_read_db(request: Request):
+    """
+    Session for read-only endpoints. Uses the replica when configured and
+    healthy, and falls back to the primary when the caller's freshness
+    requirement (X-Max-Staleness header) exceeds the current replica lag.
+    """
+    db = ReadSessionLocal() if use_replica(request) else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
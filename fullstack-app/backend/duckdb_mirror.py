@@ -0,0 +1,309 @@
+"""
+Optional columnar DuckDB mirror of the SPC tables for heavy aggregations.
+
+When DUCKDB_PATH is set and the duckdb package is installed, a background job
+copies new SPC rows into a local DuckDB file by date_process watermark, with
+a periodic full rebuild to pick up deletions. Stats, bucket, distribution and
+correlation endpoints read from the mirror once it is loaded; Postgres stays
+authoritative for raw row fetches and is used whenever the mirror is not.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import Boolean, DateTime, Float, Integer, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import ReadSessionLocal
+from query_cache import query_cache
+from spc_query import SPC_MODELS, FilterValue, filter_values
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50_000
+
+
+def _duckdb_type(column) -> str:
+    if isinstance(column.type, Float):
+        return "DOUBLE"
+    if isinstance(column.type, Integer):
+        return "BIGINT"
+    if isinstance(column.type, Boolean):
+        return "BOOLEAN"
+    if isinstance(column.type, DateTime):
+        return "TIMESTAMP"
+    return "VARCHAR"
+
+
+def build_where(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    entity: FilterValue = None,
+    process_type: FilterValue = None,
+    product_type: FilterValue = None,
+    spc_monitor_name: Optional[str] = None,
+) -> Tuple[str, List[Any]]:
+    """WHERE clause and parameters equivalent to build_spc_filters."""
+    clauses, params = [], []
+    if start_date:
+        clauses.append("date_process >= ?")
+        params.append(datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        clauses.append("date_process <= ?")
+        params.append(datetime.combine(end_date, datetime.max.time()))
+    for name, value in (
+        ("entity", entity),
+        ("process_type", process_type),
+        ("product_type", product_type),
+        ("spc_monitor_name", spc_monitor_name),
+    ):
+        values = filter_values(value)
+        if values:
+            clauses.append(f"{name} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+class DuckDBMirror:
+    """Local DuckDB copy of the SPC tables, refreshed by watermark."""
+
+    def __init__(self, path: str, rebuild_seconds: float):
+        self.path = path
+        self.rebuild_seconds = rebuild_seconds
+        self._connection = None
+        self._write_lock = threading.Lock()
+        self._ready: set = set()
+        # Latest date_process loaded per table
+        self._watermarks: Dict[str, datetime] = {}
+        self._last_rebuild = 0.0
+        self._counters = {"refreshes": 0, "rows_loaded": 0, "queries": 0}
+
+    @property
+    def enabled(self) -> bool:
+        if not self.path:
+            return False
+        try:
+            import duckdb  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def available(self, model) -> bool:
+        """Whether queries on a model's table can be served from the mirror."""
+        return model.__tablename__ in self._ready
+
+    def _connect(self):
+        if self._connection is None:
+            import duckdb
+
+            self._connection = duckdb.connect(self.path)
+        return self._connection
+
+    def _create_table(self, cursor, name: str, model):
+        columns = ", ".join(
+            f"{column.name} {_duckdb_type(column)}"
+            for column in model.__table__.columns
+        )
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {name} ({columns})")
+
+    def _copy_rows(self, cursor, db: Session, name: str, model, since) -> int:
+        """Stream rows from Postgres into a DuckDB table in columnar batches."""
+        table = model.__table__
+        statement = select(table).order_by(table.c.date_process)
+        if since is not None:
+            statement = statement.where(table.c.date_process >= since)
+        result = db.execute(statement, execution_options={"yield_per": BATCH_SIZE})
+
+        names = [column.name for column in table.columns]
+        loaded = 0
+        for partition in result.partitions():
+            batch = {
+                column: np.asarray(values, dtype=object)
+                for column, values in zip(names, zip(*partition))
+            }
+            for column in table.columns:
+                if isinstance(column.type, Float):
+                    batch[column.name] = batch[column.name].astype(np.float64)
+                elif isinstance(column.type, Integer):
+                    batch[column.name] = batch[column.name].astype(np.int64)
+                elif isinstance(column.type, DateTime):
+                    batch[column.name] = batch[column.name].astype("datetime64[us]")
+            cursor.register("incoming_batch", batch)
+            cursor.execute(
+                f"INSERT INTO {name} ({', '.join(names)}) "
+                f"SELECT {', '.join(names)} FROM incoming_batch"
+            )
+            cursor.unregister("incoming_batch")
+            loaded += len(partition)
+        return loaded
+
+    def refresh(self, db: Session, full: bool = False) -> Dict[str, int]:
+        """
+        Copy rows at or after each table's watermark (replacing rows at the
+        watermark itself, which may have been partial), or rebuild the tables
+        when full or when the rebuild interval has passed.
+        """
+        full = full or time.monotonic() - self._last_rebuild >= self.rebuild_seconds
+        loaded = {}
+
+        with self._write_lock:
+            cursor = self._connect().cursor()
+            try:
+                for model in SPC_MODELS.values():
+                    table = model.__tablename__
+                    self._create_table(cursor, table, model)
+
+                    if full:
+                        # Build a new copy and swap it in, so readers never
+                        # see a partially loaded table
+                        staging = f"{table}_staging"
+                        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+                        self._create_table(cursor, staging, model)
+                        loaded[table] = self._copy_rows(
+                            cursor, db, staging, model, None
+                        )
+                        cursor.execute("BEGIN TRANSACTION")
+                        cursor.execute(f"DROP TABLE {table}")
+                        cursor.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+                        cursor.execute("COMMIT")
+                    else:
+                        watermark = cursor.execute(
+                            f"SELECT max(date_process) FROM {table}"
+                        ).fetchone()[0]
+                        cursor.execute("BEGIN TRANSACTION")
+                        if watermark is not None:
+                            cursor.execute(
+                                f"DELETE FROM {table} WHERE date_process >= ?",
+                                [watermark],
+                            )
+                        loaded[table] = self._copy_rows(
+                            cursor, db, table, model, watermark
+                        )
+                        cursor.execute("COMMIT")
+
+                    self._watermarks[table] = cursor.execute(
+                        f"SELECT max(date_process) FROM {table}"
+                    ).fetchone()[0]
+                    self._ready.add(table)
+                    self._counters["rows_loaded"] += loaded[table]
+            except Exception:
+                try:
+                    cursor.execute("ROLLBACK")
+                except Exception:
+                    pass  # No transaction was open
+                raise
+            finally:
+                cursor.close()
+
+        if full:
+            self._last_rebuild = time.monotonic()
+        self._counters["refreshes"] += 1
+        return loaded
+
+    def execute(self, sql: str, params: Sequence[Any] = (), model=None):
+        """
+        Run a read query on its own cursor and return the cursor. Reads of a
+        model's table are reported to the query cache with its watermark.
+        """
+        if model is not None:
+            query_cache.note_copy(model, self._watermarks.get(model.__tablename__))
+        self._counters["queries"] += 1
+        cursor = self._connect().cursor()
+        return cursor.execute(sql, list(params))
+
+    def aggregate(
+        self, model, spec: List[Tuple[str, str, str, int]], **filters
+    ) -> Dict[str, Any]:
+        """Stats spec aggregates (see stats_columns) computed in DuckDB."""
+        where, params = build_where(**filters)
+        selects = ["count(lot) AS total_count"] + [
+            f"{function}({column}) AS {label}" for label, function, column, _ in spec
+        ]
+        cursor = self.execute(
+            f"SELECT {', '.join(selects)} FROM {model.__tablename__} {where}",
+            params,
+            model,
+        )
+        names = [description[0] for description in cursor.description]
+        return dict(zip(names, cursor.fetchone()))
+
+    def bucket_partials(
+        self, model, metric: str, unit: str, by_entity: bool, **filters
+    ) -> List[Tuple]:
+        """(start, [entity,] n, sum, sum_sq, min, max) rows per date_trunc unit."""
+        where, params = build_where(**filters)
+        group = "date_trunc(?, date_process)" + (", entity" if by_entity else "")
+        sql = (
+            f"SELECT {group}, count({metric}), sum({metric}), "
+            f"sum({metric} * {metric}), min({metric}), max({metric}) "
+            f"FROM {model.__tablename__} {where} GROUP BY ALL"
+        )
+        return self.execute(sql, [unit] + params, model).fetchall()
+
+    def fetch_columns(self, model, columns: List[str], **filters) -> Dict:
+        """Selected columns as NumPy arrays."""
+        where, params = build_where(**filters)
+        sql = f"SELECT {', '.join(columns)} FROM {model.__tablename__} {where}"
+        return self.execute(sql, params, model).fetchnumpy()
+
+    def distribution(
+        self, model, metric: str, quantiles: List[float], bins: int, **filters
+    ) -> Dict[str, Any]:
+        """Count, range, quantiles and equal-width histogram of a metric."""
+        where, params = build_where(**filters)
+        where = f"{where} AND" if where else "WHERE"
+        where = f"{where} {metric} IS NOT NULL"
+        table = model.__tablename__
+
+        n, low, high, values = self.execute(
+            f"SELECT count({metric}), min({metric}), max({metric}), "
+            f"quantile_cont({metric}, {[float(q) for q in quantiles]}) "
+            f"FROM {table} {where}",
+            params,
+            model,
+        ).fetchone()
+        if not n:
+            return {"n": 0, "min": None, "max": None, "quantiles": [], "counts": []}
+
+        width = (high - low) / bins or 1.0
+        rows = self.execute(
+            f"SELECT least(CAST(floor(({metric} - ?) / ?) AS BIGINT), ?), count(*) "
+            f"FROM {table} {where} GROUP BY ALL",
+            [low, width, bins - 1] + params,
+            model,
+        ).fetchall()
+        counts = [0] * bins
+        for index, count in rows:
+            counts[index] = count
+        return {"n": n, "min": low, "max": high, "quantiles": values, "counts": counts}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ready": sorted(self._ready),
+            "watermarks": {t: w.isoformat() for t, w in self._watermarks.items() if w},
+            **self._counters,
+        }
+
+    async def run_forever(self):
+        """Background loop refreshing the mirror on a fixed interval."""
+        while True:
+            db = ReadSessionLocal()
+            try:
+                await run_in_threadpool(self.refresh, db)
+            except Exception as e:
+                logger.error(f"DuckDB mirror refresh failed: {e}")
+            finally:
+                db.close()
+            await asyncio.sleep(settings.duckdb_refresh_seconds)
+
+
+duckdb_mirror = DuckDBMirror(
+    path=settings.duckdb_path,
+    rebuild_seconds=settings.duckdb_rebuild_seconds,
+)
@@ -0,0 +1,194 @@
+"""
+Precomputed guest-window snapshot of the SPC tables.
+
+Unauthenticated requests are limited to the last 30 days. A background job
+keeps those rows in memory, grouped by table and process/product combination,
+and rolls the window forward as new data lands, so guest list and stats
+requests are answered without touching the base tables.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from itertools import takewhile
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import ReadSessionLocal
+from spc_query import SPC_MODELS, GUEST_WINDOW_DAYS, FilterValue, matches_filter
+import schemas
+
+logger = logging.getLogger(__name__)
+
+# Response schema used to serialize snapshot rows, per table
+SNAPSHOT_SCHEMAS = {
+    "spc_cd_l1": schemas.SPCCdL1,
+    "spc_reg_l1": schemas.SPCRegL1,
+}
+
+
+def aggregate_rows(
+    rows: List[Dict[str, Any]], spec: List[Tuple[str, str, str, int]]
+) -> Dict[str, Any]:
+    """Compute a stats spec over snapshot rows, mirroring the SQL aggregates."""
+    values: Dict[str, Any] = {"total_count": len(rows)}
+    for label, function, column, _ in spec:
+        column_values = [row[column] for row in rows]
+        if not column_values:
+            values[label] = None
+        elif function == "avg":
+            values[label] = sum(column_values) / len(column_values)
+        elif function == "min":
+            values[label] = min(column_values)
+        elif function == "max":
+            values[label] = max(column_values)
+    return values
+
+
+class GuestSnapshot:
+    """Rolling in-memory window of SPC rows per table and combination."""
+
+    def __init__(self, window_days: int, rebuild_seconds: float):
+        self.window_days = window_days
+        self.rebuild_seconds = rebuild_seconds
+        # (table, process_type, product_type) -> rows sorted newest first
+        self._series: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        self._watermarks: Dict[str, datetime] = {}
+        self._ready: set = set()
+        self._last_rebuild = 0.0
+
+    def window_start(self) -> datetime:
+        start = date.today() - timedelta(days=self.window_days)
+        return datetime.combine(start, datetime.min.time())
+
+    def refresh(self, db: Session):
+        """
+        Append rows from each table's watermark onwards and trim the window.
+        Rows at the watermark itself are refetched, since more may have landed
+        with the same timestamp, and those already held are skipped by lot.
+        """
+        full_rebuild = time.monotonic() - self._last_rebuild >= self.rebuild_seconds
+        window_start = self.window_start()
+        series = {} if full_rebuild else dict(self._series)
+
+        for model in SPC_MODELS.values():
+            table = model.__tablename__
+            schema = SNAPSHOT_SCHEMAS[table]
+            watermark = None if full_rebuild else self._watermarks.get(table)
+
+            new_rows = (
+                db.query(model)
+                .filter(model.date_process >= (watermark or window_start))
+                .order_by(model.date_process.desc())
+                .all()
+            )
+            if watermark is not None:
+                # Held rows are newest first, so those at the watermark lead
+                held = {
+                    row["lot"]
+                    for key, rows in series.items()
+                    if key[0] == table
+                    for row in takewhile(
+                        lambda row: row["date_process"] >= watermark, rows
+                    )
+                }
+                new_rows = [row for row in new_rows if row.lot not in held]
+
+            grouped = defaultdict(list)
+            for row in new_rows:
+                grouped[(table, row.process_type, row.product_type)].append(
+                    schema.model_validate(row).model_dump()
+                )
+
+            for key in {k for k in series if k[0] == table} | set(grouped):
+                # New rows are newer than everything already held
+                rows = grouped.get(key, []) + series.get(key, [])
+                series[key] = [r for r in rows if r["date_process"] >= window_start]
+
+            if new_rows:
+                self._watermarks[table] = new_rows[0].date_process
+            elif full_rebuild:
+                self._watermarks.pop(table, None)
+            self._ready.add(table)
+
+        # Swap in the new mapping so readers never see a partial update
+        self._series = series
+        if full_rebuild:
+            self._last_rebuild = time.monotonic()
+
+    def query(
+        self,
+        model,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        entity: FilterValue = None,
+        process_type: FilterValue = None,
+        product_type: FilterValue = None,
+        spc_monitor_name: Optional[str] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Rows matching the filters, newest first, or None if the snapshot for
+        this table is not ready or the range falls outside the window.
+        """
+        table = model.__tablename__
+        if table not in self._ready:
+            return None
+
+        start = (
+            datetime.combine(start_date, datetime.min.time()) if start_date else None
+        )
+        end = datetime.combine(end_date, datetime.max.time()) if end_date else None
+        if start is None or start < self.window_start():
+            return None
+
+        matches = []
+        series = self._series
+        for (series_table, pt, pdt), rows in series.items():
+            if series_table != table:
+                continue
+            if not matches_filter(pt, process_type):
+                continue
+            if not matches_filter(pdt, product_type):
+                continue
+            matches.extend(
+                row
+                for row in rows
+                if row["date_process"] >= start
+                and (end is None or row["date_process"] <= end)
+                and matches_filter(row["entity"], entity)
+                and (
+                    not spc_monitor_name or row["spc_monitor_name"] == spc_monitor_name
+                )
+            )
+
+        matches.sort(key=lambda row: row["date_process"], reverse=True)
+        return matches
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": sorted(self._ready),
+            "series": len(self._series),
+            "rows": sum(len(rows) for rows in self._series.values()),
+            "watermarks": {t: w.isoformat() for t, w in self._watermarks.items()},
+        }
+
+    async def run_forever(self):
+        """Background loop refreshing the snapshot on a fixed interval."""
+        while True:
+            db = ReadSessionLocal()
+            try:
+                await run_in_threadpool(self.refresh, db)
+            except Exception as e:
+                logger.error(f"Guest snapshot refresh failed: {e}")
+            finally:
+                db.close()
+            await asyncio.sleep(settings.guest_snapshot_refresh_seconds)
+
+
+guest_snapshot = GuestSnapshot(
+    window_days=GUEST_WINDOW_DAYS,
+    rebuild_seconds=settings.guest_snapshot_rebuild_seconds,
+)
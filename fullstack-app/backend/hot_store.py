@@ -0,0 +1,453 @@
+"""
+In-memory columnar store of the busiest SPC process/product combinations.
+
+Most requests target a handful of combinations over recent months. Each
+worker keeps the rows of the top HOT_STORE_COMBINATIONS combinations per
+table from the last HOT_STORE_WINDOW_DAYS days as NumPy arrays: datetime64
+timestamps, float metrics and dictionary-encoded entity and monitor codes.
+A background job appends rows newer than the watermark and trims the window;
+if the arrays outgrow HOT_STORE_MAX_MB, the least busy combinations are
+evicted. Stats, distribution and control-chart requests covered by the store
+are answered from it without querying the database.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from itertools import product
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import ReadSessionLocal
+from query_cache import query_cache
+from spc_query import SPC_MODELS, FilterValue, filter_values, get_metric_columns
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HotSeries:
+    """Columns of one table and process/product combination, oldest first."""
+
+    table: str
+    process_type: str
+    product_type: str
+    date_process: np.ndarray
+    lot: np.ndarray
+    entity: np.ndarray
+    spc_monitor_name: np.ndarray
+    metrics: Dict[str, np.ndarray]
+    # Dictionaries for the encoded columns; codes index into these lists
+    entities: List[str] = field(default_factory=list)
+    monitors: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.date_process)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.date_process, self.lot, self.entity, self.spc_monitor_name]
+        return sum(a.nbytes for a in arrays + list(self.metrics.values()))
+
+
+def _encode(values: List[str], dictionary: List[str]) -> np.ndarray:
+    """Codes of values in an append-only dictionary, extending it as needed."""
+    index = {value: code for code, value in enumerate(dictionary)}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(dictionary)
+            dictionary.append(value)
+        codes[i] = code
+    return codes
+
+
+def _codes_for(values: List[str], dictionary: List[str]) -> np.ndarray:
+    wanted = set(values)
+    return np.array(
+        [code for code, value in enumerate(dictionary) if value in wanted],
+        dtype=np.int32,
+    )
+
+
+def build_series(
+    model, key: Tuple[str, str], rows: List, previous: Optional[HotSeries]
+) -> HotSeries:
+    """
+    Append rows (ordered by date_process) to a series, or start a new one.
+    The previous series is left untouched so readers keep a consistent view.
+    """
+    metrics = get_metric_columns(model)
+    entities = list(previous.entities) if previous else []
+    monitors = list(previous.monitors) if previous else []
+
+    if rows:
+        columns = list(zip(*rows))
+        new = {
+            "date_process": np.array(columns[0], dtype="datetime64[us]"),
+            "lot": np.array(columns[1], dtype=str),
+            "entity": _encode(columns[2], entities),
+            "spc_monitor_name": _encode(columns[3], monitors),
+        }
+        new_metrics = {
+            name: np.array(values, dtype=float)
+            for name, values in zip(metrics, columns[4:])
+        }
+    else:
+        new = {
+            "date_process": np.empty(0, dtype="datetime64[us]"),
+            "lot": np.empty(0, dtype=str),
+            "entity": np.empty(0, dtype=np.int32),
+            "spc_monitor_name": np.empty(0, dtype=np.int32),
+        }
+        new_metrics = {name: np.empty(0) for name in metrics}
+
+    if previous is not None:
+        new = {
+            name: np.concatenate([getattr(previous, name), values])
+            for name, values in new.items()
+        }
+        new_metrics = {
+            name: np.concatenate([previous.metrics[name], values])
+            for name, values in new_metrics.items()
+        }
+
+    return HotSeries(
+        table=model.__tablename__,
+        process_type=key[0],
+        product_type=key[1],
+        metrics=new_metrics,
+        entities=entities,
+        monitors=monitors,
+        **new,
+    )
+
+
+def trim_series(series: HotSeries, window_start: datetime) -> HotSeries:
+    """Drop rows older than the window start, copying so memory is released."""
+    cut = int(np.searchsorted(series.date_process, np.datetime64(window_start, "us")))
+    if cut == 0:
+        return series
+    return HotSeries(
+        table=series.table,
+        process_type=series.process_type,
+        product_type=series.product_type,
+        date_process=series.date_process[cut:].copy(),
+        lot=series.lot[cut:].copy(),
+        entity=series.entity[cut:].copy(),
+        spc_monitor_name=series.spc_monitor_name[cut:].copy(),
+        metrics={name: values[cut:].copy() for name, values in series.metrics.items()},
+        entities=series.entities,
+        monitors=series.monitors,
+    )
+
+
+def aggregate_columns(
+    columns: Dict[str, np.ndarray], spec: List[Tuple[str, str, str, int]]
+) -> Dict[str, Any]:
+    """Compute a stats spec over store columns, mirroring the SQL aggregates."""
+    values: Dict[str, Any] = {"total_count": len(columns["lot"])}
+    reducers = {"avg": np.nanmean, "min": np.nanmin, "max": np.nanmax}
+    for label, function, column, _ in spec:
+        data = columns[column]
+        if np.isnan(data).all():
+            values[label] = None
+        else:
+            values[label] = float(reducers[function](data))
+    return values
+
+
+def value_distribution(
+    values: np.ndarray, quantiles: List[float], bins: int
+) -> Dict[str, Any]:
+    """Count, range, quantiles and equal-width histogram of an array."""
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return {"n": 0, "min": None, "max": None, "quantiles": [], "counts": []}
+
+    low, high = float(values.min()), float(values.max())
+    width = (high - low) / bins or 1.0
+    # Same bin assignment as the SQL engines: the maximum joins the last bin
+    index = np.minimum(np.floor((values - low) / width).astype(np.int64), bins - 1)
+    return {
+        "n": len(values),
+        "min": low,
+        "max": high,
+        "quantiles": np.quantile(values, quantiles).tolist(),
+        "counts": np.bincount(index, minlength=bins).tolist(),
+    }
+
+
+class HotStore:
+    """Per-worker NumPy columns of the busiest combinations per table."""
+
+    def __init__(
+        self,
+        combinations: int,
+        window_days: int,
+        max_bytes: int,
+        rebuild_seconds: float,
+    ):
+        self.combinations = combinations
+        self.window_days = window_days
+        self.max_bytes = max_bytes
+        self.rebuild_seconds = rebuild_seconds
+        # (table, process_type, product_type) -> series
+        self._series: Dict[Tuple[str, str, str], HotSeries] = {}
+        # Row counts of each table's combinations at the last rebuild
+        self._ranking: Dict[Tuple[str, str, str], int] = {}
+        self._watermarks: Dict[str, datetime] = {}
+        # Latest date_process of each table when it was last refreshed; every
+        # held row up to it has been loaded
+        self._refreshed_through: Dict[str, Optional[datetime]] = {}
+        self._ready: set = set()
+        self._evicted: List[Tuple[str, str, str]] = []
+        self._last_rebuild: Optional[float] = None
+        self._counters = {"hits": 0, "misses": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.combinations > 0 and self.max_bytes > 0
+
+    def window_start(self) -> datetime:
+        start = date.today() - timedelta(days=self.window_days)
+        return datetime.combine(start, datetime.min.time())
+
+    def _rank_combinations(self, db: Session, model, window_start: datetime):
+        """The busiest combinations of a table in the window, by row count."""
+        rows = (
+            db.query(model.process_type, model.product_type, func.count())
+            .filter(model.date_process >= window_start)
+            .group_by(model.process_type, model.product_type)
+            .order_by(func.count().desc())
+            .limit(self.combinations)
+            .all()
+        )
+        return {
+            (model.__tablename__, process_type, product_type): count
+            for process_type, product_type, count in rows
+        }
+
+    def _fetch_rows(self, db: Session, model, keys, since, inclusive: bool):
+        columns = [
+            model.date_process,
+            model.lot,
+            model.entity,
+            model.spc_monitor_name,
+        ] + [getattr(model, name) for name in get_metric_columns(model)]
+        combo = tuple_(model.process_type, model.product_type)
+        rows = (
+            db.query(model.process_type, model.product_type, *columns)
+            .filter(combo.in_([key[1:] for key in keys]))
+            .filter(
+                model.date_process >= since if inclusive else model.date_process > since
+            )
+            .order_by(model.date_process, model.lot)
+            .all()
+        )
+        grouped: Dict[Tuple[str, str, str], List] = {key: [] for key in keys}
+        for row in rows:
+            grouped[(model.__tablename__, row[0], row[1])].append(row[2:])
+        return grouped
+
+    def _evict(self, series: Dict, ranking: Dict) -> List[Tuple[str, str, str]]:
+        """Drop the least busy combinations until the arrays fit the budget."""
+        evicted = []
+        total = sum(s.nbytes for s in series.values())
+        for key in sorted(series, key=lambda k: ranking.get(k, 0)):
+            if total <= self.max_bytes:
+                break
+            total -= series.pop(key).nbytes
+            evicted.append(key)
+        return evicted
+
+    def refresh(self, db: Session):
+        """
+        Append rows newer than each table's watermark and trim the window,
+        or re-rank the combinations and reload them when the rebuild
+        interval has passed.
+        """
+        full_rebuild = (
+            self._last_rebuild is None
+            or time.monotonic() - self._last_rebuild >= self.rebuild_seconds
+        )
+        window_start = self.window_start()
+        series = {} if full_rebuild else dict(self._series)
+        ranking = {} if full_rebuild else dict(self._ranking)
+        refreshed_through = dict(self._refreshed_through)
+
+        for model in SPC_MODELS.values():
+            table = model.__tablename__
+            # Read before fetching, so every row up to it is fetched below
+            refreshed_through[table] = db.query(func.max(model.date_process)).scalar()
+            if full_rebuild:
+                ranking.update(self._rank_combinations(db, model, window_start))
+            keys = [key for key in series if key[0] == table]
+            if full_rebuild:
+                keys = [key for key in ranking if key[0] == table]
+            watermark = None if full_rebuild else self._watermarks.get(table)
+
+            if keys:
+                grouped = self._fetch_rows(
+                    db,
+                    model,
+                    keys,
+                    window_start if watermark is None else watermark,
+                    inclusive=watermark is None,
+                )
+                for key, rows in grouped.items():
+                    updated = build_series(model, key[1:], rows, series.get(key))
+                    series[key] = trim_series(updated, window_start)
+
+            newest = [
+                s.date_process[-1]
+                for k, s in series.items()
+                if k[0] == table and len(s)
+            ]
+            if newest:
+                self._watermarks[table] = max(newest).astype(datetime)
+            elif full_rebuild:
+                self._watermarks.pop(table, None)
+            self._ready.add(table)
+
+        evicted = self._evict(series, ranking)
+        if evicted:
+            logger.warning(
+                f"Hot store over {self.max_bytes} bytes, evicted {len(evicted)} "
+                f"combinations: {evicted}"
+            )
+
+        # Swap in the new mapping so readers never see a partial update
+        self._series = series
+        self._ranking = ranking
+        self._refreshed_through = refreshed_through
+        self._evicted = evicted
+        if full_rebuild:
+            self._last_rebuild = time.monotonic()
+
+    def select(
+        self,
+        model,
+        columns: List[str],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        entity: FilterValue = None,
+        process_type: FilterValue = None,
+        product_type: FilterValue = None,
+        spc_monitor_name: Optional[str] = None,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Matching rows as arrays (entity and monitor decoded to strings), or
+        None unless every requested combination is held and the date range
+        lies inside the window. Both process_type and product_type must be
+        given.
+        """
+        table = model.__tablename__
+        process_types = filter_values(process_type)
+        product_types = filter_values(product_type)
+        start = (
+            datetime.combine(start_date, datetime.min.time()) if start_date else None
+        )
+        if (
+            table not in self._ready
+            or not process_types
+            or not product_types
+            or start is None
+            or start < self.window_start()
+        ):
+            self._counters["misses"] += 1
+            return None
+
+        # Read before the series, which refresh swaps in first, so the
+        # watermark is never newer than the rows read
+        refreshed_through = self._refreshed_through.get(table)
+        series = self._series
+        keys = [(table, pt, pdt) for pt, pdt in product(process_types, product_types)]
+        if any(key not in series for key in keys):
+            self._counters["misses"] += 1
+            return None
+        self._counters["hits"] += 1
+        query_cache.note_copy(model, refreshed_through)
+
+        end = datetime.combine(end_date, datetime.max.time()) if end_date else None
+        entities = filter_values(entity)
+        monitors = filter_values(spc_monitor_name)
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in columns}
+        for key in keys:
+            s = series[key]
+            lo = np.searchsorted(s.date_process, np.datetime64(start, "us"))
+            hi = len(s)
+            if end is not None:
+                hi = np.searchsorted(
+                    s.date_process, np.datetime64(end, "us"), side="right"
+                )
+            mask = np.zeros(len(s), dtype=bool)
+            mask[lo:hi] = True
+            if entities:
+                mask &= np.isin(s.entity, _codes_for(entities, s.entities))
+            if monitors:
+                mask &= np.isin(s.spc_monitor_name, _codes_for(monitors, s.monitors))
+
+            for name in columns:
+                if name == "entity":
+                    values = np.asarray(s.entities, dtype=object)[s.entity[mask]]
+                elif name == "spc_monitor_name":
+                    values = np.asarray(s.monitors, dtype=object)[
+                        s.spc_monitor_name[mask]
+                    ]
+                elif name in s.metrics:
+                    values = s.metrics[name][mask]
+                else:
+                    values = getattr(s, name)[mask]
+                parts[name].append(values)
+
+        return {name: np.concatenate(values) for name, values in parts.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        series = self._series
+        return {
+            "enabled": self.enabled,
+            "ready": sorted(self._ready),
+            "bytes": sum(s.nbytes for s in series.values()),
+            "max_bytes": self.max_bytes,
+            "rows": sum(len(s) for s in series.values()),
+            "series": [
+                {
+                    "table": s.table,
+                    "process_type": s.process_type,
+                    "product_type": s.product_type,
+                    "rows": len(s),
+                    "bytes": s.nbytes,
+                }
+                for s in series.values()
+            ],
+            "evicted": [list(key) for key in self._evicted],
+            "watermarks": {t: w.isoformat() for t, w in self._watermarks.items()},
+            **self._counters,
+        }
+
+    async def run_forever(self):
+        """Background loop refreshing the store on a fixed interval."""
+        while True:
+            db = ReadSessionLocal()
+            try:
+                await run_in_threadpool(self.refresh, db)
+            except Exception as e:
+                logger.error(f"Hot store refresh failed: {e}")
+            finally:
+                db.close()
+            await asyncio.sleep(settings.hot_store_refresh_seconds)
+
+
+hot_store = HotStore(
+    combinations=settings.hot_store_combinations,
+    window_days=settings.hot_store_window_days,
+    max_bytes=settings.hot_store_max_mb * 1024 * 1024,
+    rebuild_seconds=settings.hot_store_rebuild_seconds,
+)
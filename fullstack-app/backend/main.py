@@ -1,13 +1,28 @@
 import os
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+from config import settings
 from database import engine, Base
+from guest_snapshot import guest_snapshot
+from duckdb_mirror import duckdb_mirror
+from hot_store import hot_store
+from password_hashing import password_hasher
+from audit_sink import audit_sink
+from security.monitoring import security_detector
+import audit_partitions
+import audit_rollups
+import spc_rollups
+import spc_change_points
 from routers import (
     items,
     spc_cd_l1,
     spc_reg_l1,
     spc_limits,
+    spc_analytics,
+    exports,
     auth,
     users,
     audit,
@@ -74,10 +89,78 @@ def init_superuser():
 init_superuser()
 
 
+def init_audit_partitions():
+    """Create this month's and the upcoming audit_logs partitions."""
+    from sqlalchemy.orm import Session
+
+    db = Session(bind=engine)
+    try:
+        created = audit_partitions.ensure_partitions(db)
+        if created:
+            print(f"Audit partitions created: {', '.join(created)}")
+    except Exception as e:
+        print(f"Error creating audit partitions: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+# audit_logs rejects rows that no partition covers
+init_audit_partitions()
+
+
+def warm_security_detector():
+    """Replay recent audit events so alert checks are answered from memory."""
+    from sqlalchemy.orm import Session
+
+    db = Session(bind=engine)
+    try:
+        replayed = security_detector.warm(db)
+        print(f"Security detector warmed with {replayed} audit events")
+    except Exception as e:
+        print(f"Error warming security detector: {e}")
+    finally:
+        db.close()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    background_tasks = []
+    if settings.password_hash_target_ms > 0 and not settings.is_lambda:
+        # Tune the Argon2 time cost to this machine before serving logins
+        await run_in_threadpool(
+            password_hasher.calibrate, settings.password_hash_target_ms
+        )
+    if settings.enable_background_tasks:
+        # Write audit events in batches off the request path
+        background_tasks.append(asyncio.create_task(audit_sink.run_forever()))
+        # Alert checks use in-memory windows once recent events are replayed
+        await run_in_threadpool(warm_security_detector)
+        # Add upcoming audit partitions and archive expired months
+        background_tasks.append(asyncio.create_task(audit_partitions.run_forever()))
+        # Extend the hourly audit rollups behind the audit stats page
+        background_tasks.append(asyncio.create_task(audit_rollups.run_forever()))
+        # Keep the guest 30-day window precomputed so guests never hit base tables
+        background_tasks.append(asyncio.create_task(guest_snapshot.run_forever()))
+        # Extend the hourly rollups that back bucketed SPC charts
+        background_tasks.append(asyncio.create_task(spc_rollups.run_forever()))
+        # Detect mean shifts per tool series for chart overlays
+        background_tasks.append(asyncio.create_task(spc_change_points.run_forever()))
+        if hot_store.enabled:
+            # Hold the busiest combinations as in-memory columns
+            background_tasks.append(asyncio.create_task(hot_store.run_forever()))
+        if duckdb_mirror.enabled:
+            # Keep the columnar mirror that serves heavy aggregations current
+            background_tasks.append(asyncio.create_task(duckdb_mirror.run_forever()))
+
     yield
 
+    for task in background_tasks:
+        task.cancel()
+    # Write out audit events still queued
+    await audit_sink.shutdown()
+    password_hasher.shutdown()
+
 
 app = FastAPI(title="Fullstack App API", version="1.0.0", lifespan=lifespan)
 
@@ -96,7 +179,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-CSRF-Token"],  # Expose CSRF token header
+    # Expose CSRF token and paged-list total count headers
+    expose_headers=["X-CSRF-Token", "X-Total-Count", "X-Total-Count-Exact"],
 )
 
 app.include_router(system.router, prefix="/api/system", tags=["system"])
@@ -108,6 +192,10 @@ app.include_router(items.router, prefix="/api/items", tags=["items"])
 app.include_router(spc_cd_l1.router, prefix="/api/spc-cd-l1", tags=["spc-cd-l1"])
 app.include_router(spc_reg_l1.router, prefix="/api/spc-reg-l1", tags=["spc-reg-l1"])
 app.include_router(spc_limits.router, prefix="/api/spc-limits", tags=["spc-limits"])
+app.include_router(
+    spc_analytics.router, prefix="/api/spc-analytics", tags=["spc-analytics"]
+)
+app.include_router(exports.router, prefix="/api/exports", tags=["exports"])
 
 
 @app.get("/")
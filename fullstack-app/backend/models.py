@@ -49,6 +49,17 @@ class SPCCdL1(Base):
     )  # XLY1, XLY2, BNT44, VLQR1
     spc_monitor_name = Column(String, nullable=False, index=True)  # SPC_CD_L1
 
+    # Serves multi-entity filters within a combination, newest first
+    __table_args__ = (
+        Index(
+            "idx_spc_cd_l1_combo_entity_date",
+            "process_type",
+            "product_type",
+            "entity",
+            "date_process",
+        ),
+    )
+
 
 class SPCRegL1(Base):
     __tablename__ = "spc_reg_l1"
@@ -75,6 +86,17 @@ class SPCRegL1(Base):
         Float, nullable=False
     )  # Centrality rotation measurement
 
+    # Serves multi-entity filters within a combination, newest first
+    __table_args__ = (
+        Index(
+            "idx_spc_reg_l1_combo_entity_date",
+            "process_type",
+            "product_type",
+            "entity",
+            "date_process",
+        ),
+    )
+
 
 class SPCLimits(Base):
     __tablename__ = "spc_limits"
@@ -110,6 +132,89 @@ class SPCLimits(Base):
     )
 
 
+class SPCRollupHourly(Base):
+    __tablename__ = "spc_rollup_hourly"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_table = Column(String, nullable=False)  # spc_cd_l1, spc_reg_l1
+    metric = Column(String, nullable=False)  # cd_att, scale_x, etc.
+    bucket_start = Column(DateTime, nullable=False)  # Start of the hour
+    process_type = Column(String, nullable=False)
+    product_type = Column(String, nullable=False)
+    spc_monitor_name = Column(String, nullable=False)
+    entity = Column(String, nullable=False)
+    n = Column(Integer, nullable=False)  # Row count
+    total = Column(Float, nullable=False)  # Sum of values
+    total_sq = Column(Float, nullable=False)  # Sum of squared values
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+
+    # Create composite index for efficient querying
+    __table_args__ = (
+        Index(
+            "idx_spc_rollup_hourly_composite",
+            "source_table",
+            "metric",
+            "process_type",
+            "product_type",
+            "bucket_start",
+        ),
+    )
+
+
+class SPCChangePoint(Base):
+    __tablename__ = "spc_change_points"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_table = Column(String, nullable=False)  # spc_cd_l1, spc_reg_l1
+    metric = Column(String, nullable=False)  # bias, bias_x_y, scale_x, etc.
+    process_type = Column(String, nullable=False)
+    product_type = Column(String, nullable=False)
+    entity = Column(String, nullable=False)
+    date_process = Column(DateTime, nullable=False)  # First point after the shift
+    lot = Column(String, nullable=False)
+    mean_before = Column(Float, nullable=False)
+    mean_after = Column(Float, nullable=False)
+    detected_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Create composite index for efficient querying
+    __table_args__ = (
+        Index(
+            "idx_spc_change_points_composite",
+            "source_table",
+            "process_type",
+            "product_type",
+            "entity",
+            "date_process",
+        ),
+    )
+
+
+class SPCChangePointState(Base):
+    __tablename__ = "spc_change_point_state"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_table = Column(String, nullable=False)
+    metric = Column(String, nullable=False)
+    process_type = Column(String, nullable=False)
+    product_type = Column(String, nullable=False)
+    entity = Column(String, nullable=False)
+    segment_start = Column(DateTime, nullable=True)  # Last detected change point
+    processed_through = Column(DateTime, nullable=False)  # Latest date_process seen
+
+    __table_args__ = (
+        Index(
+            "idx_spc_change_point_state_series",
+            "source_table",
+            "metric",
+            "process_type",
+            "product_type",
+            "entity",
+            unique=True,
+        ),
+    )
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -119,6 +224,8 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=False)
     is_superuser = Column(Boolean, default=False)
+    # Embedded in issued JWTs; bumping it revokes all of the user's tokens
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -172,7 +279,7 @@ class RefreshToken(Base):
 class AuditLog(Base):
     __tablename__ = "audit_logs"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     action = Column(String(100), nullable=False)
     resource = Column(String(255), nullable=True)
@@ -180,7 +287,13 @@ class AuditLog(Base):
     user_agent = Column(Text, nullable=True)
     success = Column(Boolean, nullable=False)
     details = Column(JSON, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Part of the primary key because the table is partitioned on it
+    created_at = Column(
+        DateTime(timezone=True),
+        primary_key=True,
+        server_default=func.now(),
+        index=True,
+    )
 
     # Relationships
     user = relationship("User", back_populates="audit_logs")
@@ -188,9 +301,34 @@ class AuditLog(Base):
     # Create composite index for efficient querying
     __table_args__ = (
         Index("idx_audit_logs_user_action", "user_id", "action", "created_at"),
+        # Keyset paging in (created_at, id) order and action lookups
+        Index("idx_audit_logs_created_id", "created_at", "id"),
+        Index("idx_audit_logs_action_created", "action", "created_at"),
+        # Subnet containment (<<=) lookups on ip_address
+        Index(
+            "idx_audit_logs_ip_gist",
+            "ip_address",
+            postgresql_using="gist",
+            postgresql_ops={"ip_address": "inet_ops"},
+        ),
+        # Monthly partitions are managed by audit_partitions.py
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
+class AuditLogRollup(Base):
+    __tablename__ = "audit_log_rollup"
+
+    id = Column(Integer, primary_key=True, index=True)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)  # Start of the hour
+    action = Column(String(100), nullable=False)
+    success = Column(Boolean, nullable=False)
+    user_id = Column(Integer, nullable=True)  # Kept after the user is deleted
+    n = Column(Integer, nullable=False)  # Event count
+
+    __table_args__ = (Index("idx_audit_log_rollup_bucket", "bucket_start", "action"),)
+
+
 class BlacklistedToken(Base):
     __tablename__ = "blacklisted_tokens"
 
@@ -0,0 +1,260 @@
+"""
+Incremental Parquet snapshots of the SPC tables for offline analytics.
+
+Each table is written as one file per month under
+{PARQUET_EXPORT_DIR}/{table}/month=YYYY-MM/data.parquet (Hive-style
+partitions). A manifest per table records the row count, latest timestamp
+and a content fingerprint (sum of hashtext over the rows) of every exported
+month, and a run only rewrites months where any of them changed, so updated
+rows are re-exported too. Rows are streamed from a server-side cursor and
+written batch by batch, so memory is bounded by the batch size, not the table
+size.
+
+pyarrow is an optional dependency and is only imported when exporting.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from sqlalchemy import Boolean, DateTime, Float, Integer, func, literal_column, select
+from sqlalchemy.orm import Session
+from config import settings
+from database import ReadSessionLocal
+import models
+
+logger = logging.getLogger(__name__)
+
+# Table name -> (model, timestamp column used for monthly partitions)
+EXPORT_TABLES = {
+    "spc_cd_l1": (models.SPCCdL1, "date_process"),
+    "spc_reg_l1": (models.SPCRegL1, "date_process"),
+    "spc_limits": (models.SPCLimits, "effective_date"),
+}
+
+MANIFEST_NAME = "_manifest.json"
+BATCH_SIZE = 50_000
+
+# Held while an export started from the API runs in the background
+export_lock = threading.Lock()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError(
+            "Parquet export requires pyarrow (pip install pyarrow)"
+        ) from e
+    return pyarrow, pyarrow.parquet
+
+
+def check_available():
+    """Raise RuntimeError if pyarrow is not installed."""
+    _import_pyarrow()
+
+
+def export_root() -> Path:
+    return Path(settings.parquet_export_dir)
+
+
+def snapshot_path(table: str, month: str) -> Path:
+    return export_root() / table / f"month={month}" / "data.parquet"
+
+
+def load_manifest(table: str) -> Dict[str, Dict[str, Any]]:
+    path = export_root() / table / MANIFEST_NAME
+    if not path.is_file():
+        return {}
+    return json.loads(path.read_text())
+
+
+def _save_manifest(table: str, manifest: Dict[str, Dict[str, Any]]):
+    path = export_root() / table / MANIFEST_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def arrow_schema(pa, model):
+    """Arrow schema matching a model's columns."""
+    fields = []
+    for column in model.__table__.columns:
+        if isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us", tz="UTC" if column.type.timezone else None)
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type, nullable=column.nullable))
+    return pa.schema(fields)
+
+
+def month_summaries(db: Session, model, date_column: str) -> Dict[str, Dict]:
+    """
+    Row count, latest timestamp and content fingerprint per month, used to
+    detect changes. The fingerprint catches updates and delete-plus-insert
+    that leave the count and latest timestamp as they were; it is only
+    computed on PostgreSQL.
+    """
+    column = getattr(model, date_column)
+    month = func.date_trunc("month", column, type_=DateTime)
+    if db.get_bind().dialect.name == "postgresql":
+        # Whole-row text of each row, hashed and summed per month
+        fingerprint = func.sum(
+            func.hashtext(literal_column(f"{model.__tablename__}::text"))
+        )
+    else:
+        fingerprint = literal_column("NULL")
+    rows = (
+        db.query(month, func.count(), func.max(column), fingerprint)
+        .group_by(month)
+        .all()
+    )
+    return {
+        start.strftime("%Y-%m"): {
+            "rows": count,
+            "latest": latest.isoformat(),
+            "fingerprint": None if digest is None else int(digest),
+        }
+        for start, count, latest, digest in rows
+    }
+
+
+def _month_bounds(month: str):
+    start = datetime.strptime(month, "%Y-%m")
+    if start.month == 12:
+        return start, start.replace(year=start.year + 1, month=1)
+    return start, start.replace(month=start.month + 1)
+
+
+def write_month(db: Session, model, date_column: str, month: str) -> int:
+    """Stream one month of a table into its Parquet file. Returns rows written."""
+    pa, pq = _import_pyarrow()
+    schema = arrow_schema(pa, model)
+    column = getattr(model, date_column)
+    start, end = _month_bounds(month)
+
+    statement = (
+        select(model.__table__).where(column >= start, column < end).order_by(column)
+    )
+    # yield_per streams from a server-side cursor instead of buffering the month
+    result = db.execute(statement, execution_options={"yield_per": BATCH_SIZE})
+
+    path = snapshot_path(model.__tablename__, month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    written = 0
+    with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        for partition in result.partitions():
+            values = list(zip(*partition))
+            writer.write_batch(
+                pa.record_batch(
+                    [
+                        pa.array(column_values, type=field.type)
+                        for column_values, field in zip(values, schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            written += len(partition)
+    # Readers never see a half-written file
+    os.replace(tmp, path)
+    return written
+
+
+def export_tables(db: Session, tables: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Bring the Parquet snapshots of the given tables (default: all) up to
+    date. Returns the months written, unchanged and removed per table.
+    """
+    _import_pyarrow()
+    summary = {}
+
+    for table in tables or EXPORT_TABLES:
+        model, date_column = EXPORT_TABLES[table]
+        manifest = load_manifest(table)
+        current = month_summaries(db, model, date_column)
+        written, unchanged, removed = [], 0, []
+
+        for month, state in sorted(current.items()):
+            exported = manifest.get(month)
+            if (
+                exported
+                and exported["rows"] == state["rows"]
+                and exported["latest"] == state["latest"]
+                and exported.get("fingerprint") == state["fingerprint"]
+                and snapshot_path(table, month).is_file()
+            ):
+                unchanged += 1
+                continue
+
+            rows = write_month(db, model, date_column, month)
+            manifest[month] = {
+                **state,
+                "rows": rows,
+                "exported_at": datetime.now(timezone.utc).isoformat(),
+            }
+            written.append(month)
+            # Record progress so an interrupted run resumes where it stopped
+            _save_manifest(table, manifest)
+
+        for month in sorted(set(manifest) - set(current)):
+            snapshot_path(table, month).unlink(missing_ok=True)
+            del manifest[month]
+            removed.append(month)
+
+        _save_manifest(table, manifest)
+        summary[table] = {
+            "written": written,
+            "unchanged": unchanged,
+            "removed": removed,
+        }
+
+    return summary
+
+
+def run_export_job(tables: Optional[List[str]] = None):
+    """
+    export_tables on its own replica session, for a background task started
+    while holding export_lock. Releases the lock when done.
+    """
+    db = ReadSessionLocal()
+    try:
+        summary = export_tables(db, tables)
+        logger.info(f"Parquet export finished: {summary}")
+    except Exception as e:
+        logger.error(f"Parquet export failed: {e}")
+    finally:
+        db.close()
+        export_lock.release()
+
+
+def list_snapshots() -> List[Dict[str, Any]]:
+    """Exported snapshot files with their row counts and sizes."""
+    snapshots = []
+    for table in EXPORT_TABLES:
+        for month, state in sorted(load_manifest(table).items()):
+            path = snapshot_path(table, month)
+            if not path.is_file():
+                continue
+            snapshots.append(
+                {
+                    "table": table,
+                    "month": month,
+                    "rows": state["rows"],
+                    "latest": state["latest"],
+                    "exported_at": state.get("exported_at"),
+                    "size_bytes": path.stat().st_size,
+                }
+            )
+    return snapshots
@@ -0,0 +1,192 @@
+"""
+Argon2id hashing off the event loop.
+
+Hashing and verification run in a dedicated, bounded executor: a process pool
+on servers (Argon2 is CPU-bound) and a thread pool on Lambda, where process
+pools are unavailable. Requests beyond PASSWORD_HASH_MAX_PENDING are rejected
+with PasswordHasherBusy instead of queueing without bound.
+
+At startup, the time cost is calibrated so that one hash takes about
+PASSWORD_HASH_TARGET_MS at the configured memory cost. Hashes made with
+weaker parameters are transparently re-hashed on the next successful login.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from passlib.hash import argon2
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# (time_cost, memory_cost in KiB, parallelism)
+HashParams = Tuple[int, int, int]
+
+MAX_TIME_COST = 20
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash operations are already pending."""
+
+
+@lru_cache(maxsize=8)
+def _handler(params: HashParams):
+    time_cost, memory_cost, parallelism = params
+    return argon2.using(
+        time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+    )
+
+
+def hash_with(password: str, params: HashParams) -> str:
+    return _handler(params).hash(password)
+
+
+def verify_with(
+    password: str, hashed: str, params: HashParams
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password, returning (valid, new_hash). new_hash is set when the
+    stored hash used weaker parameters than params.
+    """
+    if not argon2.verify(password, hashed):
+        return False, None
+
+    stored = argon2.from_string(hashed)
+    if stored.rounds < params[0] or stored.memory_cost < params[1]:
+        return True, hash_with(password, params)
+    return True, None
+
+
+def calibrate(
+    target_ms: float, min_time_cost: int, memory_cost: int, parallelism: int
+) -> HashParams:
+    """
+    The largest time cost (at least min_time_cost) whose hash takes no longer
+    than target_ms on this machine.
+    """
+    time_cost = min_time_cost
+    for candidate in range(min_time_cost, max(min_time_cost, MAX_TIME_COST) + 1):
+        params = (candidate, memory_cost, parallelism)
+        start = time.perf_counter()
+        hash_with("calibration-password", params)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > target_ms and candidate > min_time_cost:
+            break
+        time_cost = candidate
+    return time_cost, memory_cost, parallelism
+
+
+class PasswordHasher:
+    """Bounded executor for Argon2 hashing with queue-depth metrics."""
+
+    def __init__(self, workers: int, max_pending: int, params: HashParams):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.params = params
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hashes": 0,
+            "verifications": 0,
+            "rehashes": 0,
+            "rejected": 0,
+            "max_pending_seen": 0,
+        }
+        self._calibration: Dict[str, Any] = {}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if settings.is_lambda:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="argon2"
+                )
+            else:
+                # Spawned workers do not inherit the server's threads or sockets
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise PasswordHasherBusy()
+            self._pending += 1
+            self._counters["max_pending_seen"] = max(
+                self._counters["max_pending_seen"], self._pending
+            )
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        self._counters["hashes"] += 1
+        return await self._submit(hash_with, password, self.params)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        self._counters["verifications"] += 1
+        valid, new_hash = await self._submit(verify_with, password, hashed, self.params)
+        if new_hash is not None:
+            self._counters["rehashes"] += 1
+        return valid, new_hash
+
+    def hash_sync(self, password: str) -> str:
+        """Hash in the calling thread, for scripts and sync handlers."""
+        return hash_with(password, self.params)
+
+    def calibrate(self, target_ms: float):
+        """
+        Re-tune the time cost to the target latency on this machine, never
+        below PASSWORD_HASH_TIME_COST.
+        """
+        _, memory_cost, parallelism = self.params
+        start = time.perf_counter()
+        self.params = calibrate(
+            target_ms, settings.password_hash_time_cost, memory_cost, parallelism
+        )
+        self._calibration = {
+            "target_ms": target_ms,
+            "took_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        logger.info(f"Argon2 calibrated to time_cost={self.params[0]}")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "workers": self.workers,
+                "executor": "thread" if settings.is_lambda else "process",
+                "params": dict(
+                    zip(("time_cost", "memory_cost", "parallelism"), self.params)
+                ),
+                "calibration": self._calibration,
+            }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+    params=(
+        settings.password_hash_time_cost,
+        settings.password_hash_memory_kib,
+        settings.password_hash_parallelism,
+    ),
+)
@@ -0,0 +1,145 @@
+"""
+In-process cache of authenticated principals.
+
+Resolving a bearer token costs a revocation lookup and a user lookup. Entries
+map the SHA-256 of an access token to its decoded payload and a detached
+snapshot of the active user, so repeated requests with the same token skip
+both queries. Entries expire after a short TTL (never past the token's own
+expiry) and are dropped when the user is updated, deactivated, deleted or
+logs out. Invalidation is per worker; other workers converge within the TTL.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+from config import settings
+from models import User
+
+
+def token_key(token: str) -> str:
+    """Cache key for a token; raw tokens are never held as keys."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def snapshot_user(user: User) -> User:
+    """
+    Detached copy of a user's column values. It is never added to a session,
+    so it stays readable after the request that loaded it has closed.
+    """
+    return User(
+        **{column.name: getattr(user, column.name) for column in User.__table__.columns}
+    )
+
+
+class PrincipalCache:
+    """Bounded LRU map of token hash -> (payload, user snapshot) with a TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # token hash -> (payload, user, expires_at)
+        self._entries: OrderedDict = OrderedDict()
+        # user id -> token hashes, for per-user invalidation
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, token: str) -> Optional[Tuple[Dict[str, Any], User]]:
+        if not self.enabled:
+            return None
+
+        key = token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+
+            payload, user, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self._counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return payload, user
+
+    def set(self, token: str, payload: Dict[str, Any], user: User):
+        if not self.enabled:
+            return
+
+        ttl = self.ttl_seconds
+        if "exp" in payload:
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl <= 0:
+            return
+
+        key = token_key(token)
+        snapshot = snapshot_user(user)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (payload, snapshot, time.monotonic() + ttl)
+            self._by_user.setdefault(snapshot.id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def invalidate_token(self, token: str):
+        with self._lock:
+            if self._remove(token_key(token)):
+                self._counters["invalidations"] += 1
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token of a user."""
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+                self._counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": (
+                    round(self._counters["hits"] / lookups, 4) if lookups else 0.0
+                ),
+            }
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        keys = self._by_user.get(entry[1].id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry[1].id]
+        return True
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.principal_cache_max_entries,
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+)
@@ -0,0 +1,258 @@
+"""
+In-process result cache for SPC read queries.
+
+Entries are keyed by a normalized form of the filter parameters, evicted in
+LRU order once the byte budget is exceeded, expire after a TTL, and are
+dropped as soon as the watermark (latest date_process) of their table moves.
+Entries and watermarks are kept per engine, so a request routed to the primary
+(for example because of X-Max-Staleness) never gets a result read from the
+replica.
+Results read from an in-memory copy of a table (the DuckDB mirror or the hot
+store) that is older than the table's watermark are returned but not cached,
+so they cannot stay cached after the copy catches up.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import bind_name, session_factory_for
+from singleflight import query_flight
+
+
+def _normalize(value: Any, bucket_seconds: int) -> Hashable:
+    """Normalize a parameter value so equivalent requests share a key."""
+    if isinstance(value, datetime):
+        # Snap datetimes down to the start of their bucket
+        ts = value.replace(tzinfo=value.tzinfo or timezone.utc).timestamp()
+        return datetime.fromtimestamp(
+            ts - ts % bucket_seconds, tz=timezone.utc
+        ).isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted(_normalize(v, bucket_seconds) for v in value))
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+class QueryCache:
+    """Bounded LRU cache with TTL expiry and per-table watermark invalidation."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl_seconds: float,
+        watermark_interval: float,
+        bucket_seconds: int = 3600,
+        enabled: bool = True,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.watermark_interval = watermark_interval
+        self.bucket_seconds = bucket_seconds
+        self.enabled = enabled
+
+        # key -> (value, size_bytes, expires_at, (engine, table))
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        # (engine, table) -> (watermark, checked_at)
+        self._watermarks: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "stale_copies": 0,
+        }
+        # Copies read by the computation running on this thread
+        self._local = threading.local()
+
+    def make_key(self, namespace: str, **params) -> Tuple:
+        """Build a cache key from a namespace and filter parameters."""
+        normalized = tuple(
+            sorted(
+                (name, _normalize(value, self.bucket_seconds))
+                for name, value in params.items()
+                if value is not None
+            )
+        )
+        return (namespace, normalized)
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return False, None
+
+            value, size, expires_at, _ = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return True, value
+
+    def set(self, key: Tuple, value: Any, table: str, source: str):
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (
+                value,
+                size,
+                time.monotonic() + self.ttl_seconds,
+                (source, table),
+            )
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, table: str, source: Optional[str] = None):
+        """Drop every entry computed from a table, or from its copy on one engine."""
+        with self._lock:
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if entry[3][1] == table and source in (None, entry[3][0])
+            ]
+            for key in stale:
+                self._remove(key)
+            self._counters["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._watermarks.clear()
+
+    def check_watermark(self, db: Session, model):
+        """
+        Invalidate a table's entries on db's engine if its latest date_process
+        there has moved. The watermark query runs at most once per
+        watermark_interval and engine.
+        """
+        scope = (bind_name(db), model.__tablename__)
+        now = time.monotonic()
+        current = self._watermarks.get(scope)
+        if current is not None and now - current[1] < self.watermark_interval:
+            return
+
+        watermark = db.query(func.max(model.date_process)).scalar()
+        if current is not None and current[0] != watermark:
+            self.invalidate(scope[1], scope[0])
+        self._watermarks[scope] = (watermark, now)
+
+    def note_copy(self, model, watermark):
+        """
+        Record that the running computation read a copy of a table loaded up
+        to watermark (its latest date_process). Outside a computation this
+        does nothing.
+        """
+        copies = getattr(self._local, "copies", None)
+        if copies is not None:
+            copies.append((model.__tablename__, watermark))
+
+    def _copies_current(self, copies, source: str) -> bool:
+        """Whether every copy read is at least as new as its table's watermark."""
+        with self._lock:
+            for table, watermark in copies:
+                current = self._watermarks.get((source, table))
+                if current is None or current[0] is None:
+                    continue
+                if watermark is None or watermark < current[0]:
+                    self._counters["stale_copies"] += 1
+                    return False
+        return True
+
+    async def get_or_compute_async(
+        self,
+        db: Session,
+        model,
+        namespace: str,
+        params: Dict[str, Any],
+        compute: Callable[[Session], Any],
+    ) -> Any:
+        """
+        Async variant for request handlers. The query runs in the threadpool,
+        and concurrent misses for the same key share a single execution.
+
+        compute receives its own session on the same engine as db. The shared
+        execution outlives a caller that disconnects, whose request session is
+        closed at that point, so it must not use the caller's session.
+
+        Results are cached and shared per engine: a caller on the primary only
+        sees results computed on the primary.
+        """
+        key = self.make_key(namespace, **params)
+        source = bind_name(db)
+        cache_key = (source,) + key
+
+        if self.enabled:
+            await run_in_threadpool(self.check_watermark, db, model)
+            hit, value = self.get(cache_key)
+            if hit:
+                return value
+
+        session_factory = session_factory_for(db)
+
+        def compute_and_store():
+            session = session_factory()
+            self._local.copies = []
+            try:
+                value = compute(session)
+                copies = self._local.copies
+            finally:
+                self._local.copies = None
+                session.close()
+            if self.enabled and self._copies_current(copies, source):
+                self.set(cache_key, value, model.__tablename__, source)
+            return value
+
+        # Only callers on the same engine share an execution
+        return await query_flight.do(cache_key, compute_and_store)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": (
+                    round(self._counters["hits"] / lookups, 4) if lookups else 0.0
+                ),
+            }
+
+    def _remove(self, key: Tuple):
+        entry: Optional[Tuple] = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+query_cache = QueryCache(
+    max_bytes=settings.query_cache_max_bytes,
+    ttl_seconds=settings.query_cache_ttl_seconds,
+    watermark_interval=settings.query_cache_watermark_seconds,
+    enabled=settings.query_cache_enabled,
+)
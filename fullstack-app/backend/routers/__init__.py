@@ -6,3 +6,5 @@ from . import users as users
 from . import audit as audit
 from . import security as security
 from . import system as system
+from . import spc_analytics as spc_analytics
+from . import exports as exports
@@ -1,16 +1,22 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, tuple_
 from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 
 from database import get_db
+from audit_actions import audit_actions
+from audit_rollups import audit_stats
 from models import AuditLog, User
 from permissions import require_superuser
 from schemas import AuditLogResponse
 
 router = APIRouter()
 
+# Most active users shown in the statistics, and user ids looked up per query
+TOP_USERS = 5
+TOP_USERS_BATCH = 50
+
 
 @router.get(
     "/",
@@ -25,34 +31,55 @@ def get_audit_logs(
     status: Optional[bool] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    before_created_at: Optional[datetime] = None,
+    before_id: Optional[int] = None,
     db: Session = Depends(get_db),
 ):
     """
     Get audit logs with optional filtering (superuser only).
+
+    Logs are returned newest first. To page, pass the created_at and id of the
+    last log received as before_created_at and before_id; skip still works
+    but gets slower the deeper the page.
     """
-    query = db.query(AuditLog).join(User, AuditLog.user_id == User.id, isouter=True)
+    # User columns come from the same query instead of a lazy load per row
+    query = db.query(AuditLog, User.username, User.email).outerjoin(
+        User, AuditLog.user_id == User.id
+    )
 
     # Apply filters
     filters = []
     if user_id is not None:
         filters.append(AuditLog.user_id == user_id)
     if action:
-        filters.append(AuditLog.action.contains(action))
+        # Resolve the fragment against the known actions so the index is used
+        actions = audit_actions.matching(db, action)
+        if not actions:
+            return []
+        filters.append(AuditLog.action.in_(actions))
     if status is not None:
         filters.append(AuditLog.success == status)
     if start_date:
         filters.append(AuditLog.created_at >= start_date)
     if end_date:
         filters.append(AuditLog.created_at <= end_date)
+    if before_created_at is not None:
+        if before_id is not None:
+            filters.append(
+                tuple_(AuditLog.created_at, AuditLog.id)
+                < tuple_(before_created_at, before_id)
+            )
+        else:
+            filters.append(AuditLog.created_at < before_created_at)
 
     if filters:
         query = query.filter(and_(*filters))
 
-    # Order by most recent first
-    query = query.order_by(AuditLog.created_at.desc())
+    # Order by most recent first; id breaks ties so keyset pages never overlap
+    query = query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
 
     # Apply pagination
-    logs = query.offset(skip).limit(limit).all()
+    rows = query.offset(skip).limit(limit).all()
 
     # Convert to response model with user info
     return [
@@ -60,9 +87,7 @@ def get_audit_logs(
             id=log.id,
             user_id=log.user_id,
             user=(
-                {"username": log.user.username, "email": log.user.email}
-                if log.user
-                else None
+                {"username": username, "email": email} if username is not None else None
             ),
             action=log.action,
             resource=log.resource,
@@ -72,7 +97,7 @@ def get_audit_logs(
             user_agent=log.user_agent,
             created_at=log.created_at,
         )
-        for log in logs
+        for log, username, email in rows
     ]
 
 
@@ -83,8 +108,7 @@ def get_audit_actions(db: Session = Depends(get_db)):
     """
     Get list of unique audit log actions (superuser only).
     """
-    actions = db.query(AuditLog.action).distinct().all()
-    return [action[0] for action in actions]
+    return audit_actions.names(db)
 
 
 @router.get("/stats", dependencies=[Depends(require_superuser)])
@@ -94,60 +118,36 @@ def get_audit_stats(days: int = Query(default=7, le=30), db: Session = Depends(g
     """
     start_date = datetime.now(timezone.utc) - timedelta(days=days)
 
-    # Total logs
-    total_logs = db.query(AuditLog).filter(AuditLog.created_at >= start_date).count()
-
-    # Failed attempts
-    failed_attempts = (
-        db.query(AuditLog)
-        .filter(and_(AuditLog.created_at >= start_date, AuditLog.success.is_(False)))
-        .count()
-    )
-
-    # Login attempts
-    login_attempts = (
-        db.query(AuditLog)
-        .filter(
-            and_(
-                AuditLog.created_at >= start_date,
-                AuditLog.action.in_(["login", "login_attempt"]),
+    # Whole hours come from the hourly rollups, the rest from audit_logs
+    stats = audit_stats(db, start_date)
+    user_counts = stats.pop("user_counts")
+
+    # Most active users that still exist, looked up a batch of ids at a time
+    ranked = sorted(user_counts, key=user_counts.get, reverse=True)
+    active_users = []
+    for offset in range(0, len(ranked), TOP_USERS_BATCH):
+        batch = ranked[offset : offset + TOP_USERS_BATCH]
+        users = {
+            user.id: user
+            for user in db.query(User.id, User.username, User.email).filter(
+                User.id.in_(batch)
             )
+        }
+        active_users.extend(
+            {
+                "username": users[user_id].username,
+                "email": users[user_id].email,
+                "actions": user_counts[user_id],
+            }
+            for user_id in batch
+            if user_id in users
         )
-        .count()
-    )
-
-    # Registration attempts
-    registration_attempts = (
-        db.query(AuditLog)
-        .filter(
-            and_(
-                AuditLog.created_at >= start_date,
-                AuditLog.action.in_(["register", "registration_attempt"]),
-            )
-        )
-        .count()
-    )
-
-    # Most active users
-    active_users = (
-        db.query(
-            User.username, User.email, db.func.count(AuditLog.id).label("action_count")
-        )
-        .join(AuditLog)
-        .filter(AuditLog.created_at >= start_date)
-        .group_by(User.id)
-        .order_by(db.func.count(AuditLog.id).desc())
-        .limit(5)
-        .all()
-    )
+        if len(active_users) >= TOP_USERS:
+            break
+    active_users = active_users[:TOP_USERS]
 
     return {
         "period_days": days,
-        "total_logs": total_logs,
-        "failed_attempts": failed_attempts,
-        "login_attempts": login_attempts,
-        "registration_attempts": registration_attempts,
-        "most_active_users": [
-            {"username": u[0], "email": u[1], "actions": u[2]} for u in active_users
-        ],
+        **stats,
+        "most_active_users": active_users,
     }
@@ -14,7 +14,7 @@ import secrets
 import os
 
 from database import get_db
-from models import User, RefreshToken, RegistrationRequest as RegistrationRequestModel
+from models import User, RegistrationRequest as RegistrationRequestModel
 from schemas import (
     LoginRequest,
     Token,
@@ -23,18 +23,20 @@ from schemas import (
     RegistrationRequest,
     RegistrationResponse,
 )
+from token_versions import token_versions
 from auth import (
     authenticate_user,
     create_access_token,
     create_refresh_token,
     get_current_user,
-    get_password_hash,
+    get_password_hash_async,
     save_refresh_token,
-    invalidate_refresh_token,
     invalidate_all_user_tokens,
     verify_token,
     create_audit_log,
     blacklist_token,
+    revoke_user_tokens,
+    rotate_refresh_token,
     REFRESH_TOKEN_EXPIRE_DAYS,
     security,
 )
@@ -96,7 +98,7 @@ async def register(
         )
 
     # Create registration request
-    hashed_password = get_password_hash(registration.password)
+    hashed_password = await get_password_hash_async(registration.password)
     token = secrets.token_urlsafe(32)
     expires_at = datetime.now(timezone.utc) + timedelta(days=7)
 
@@ -157,9 +159,13 @@ async def login(
     db: Session = Depends(get_db),
 ):
     """
-    Login with email and password. Returns access and refresh tokens.
+    Login with email and password. Returns access and refresh tokens. The
+    refresh token and any password re-hash commit together; the audit entry
+    joins that commit only when the audit sink is not running.
     """
-    user = authenticate_user(db, login_data.email, login_data.password)
+    user = await authenticate_user(
+        db, login_data.email, login_data.password, commit=False
+    )
 
     if not user:
         create_audit_log(
@@ -178,12 +184,18 @@ async def login(
         )
 
     # Create tokens
-    access_token = create_access_token(data={"sub": str(user.id)})
-    refresh_token = create_refresh_token(data={"sub": str(user.id)})
+    access_token = create_access_token(
+        data={"sub": str(user.id), "ver": user.token_version}
+    )
+    refresh_token = create_refresh_token(
+        data={"sub": str(user.id), "ver": user.token_version}
+    )
 
     # Save refresh token to database
     expires_at = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    save_refresh_token(db, user.id, refresh_token, expires_at)
+    save_refresh_token(db, user.id, refresh_token, expires_at, commit=False)
+    create_audit_log(db, user.id, "login", None, True, request, commit=False)
+    db.commit()
 
     # Set refresh token in httpOnly cookie
     response.set_cookie(
@@ -195,8 +207,6 @@ async def login(
         max_age=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
     )
 
-    create_audit_log(db, user.id, "login", None, True, request)
-
     return Token(access_token=access_token, refresh_token=refresh_token)
 
 
@@ -209,19 +219,25 @@ async def logout(
     db: Session = Depends(get_db),
 ):
     """
-    Logout the current user. Invalidates all refresh tokens and blacklists the access token.
+    Logout the current user. Revokes all of the user's tokens and invalidates
+    all refresh tokens.
     """
-    # Blacklist the current access token
-    blacklist_token(db, credentials.credentials, current_user.id, "logout")
+    # Revoke every token issued so far; tokens issued before token versions
+    # existed are blacklisted instead
+    revoke_user_tokens(db, current_user.id, commit=False)
+    blacklist_token(
+        db, credentials.credentials, current_user.id, "logout", commit=False
+    )
 
     # Invalidate all user refresh tokens
-    invalidate_all_user_tokens(db, current_user.id)
+    invalidate_all_user_tokens(db, current_user.id, commit=False)
+
+    create_audit_log(db, current_user.id, "logout", None, True, request, commit=False)
+    db.commit()
 
     # Clear refresh token cookie
     response.delete_cookie(key="refresh_token")
 
-    create_audit_log(db, current_user.id, "logout", None, True, request)
-
     return {"message": "Successfully logged out"}
 
 
@@ -245,48 +261,33 @@ async def refresh_token(
             )
         user_id = int(user_id_str)
 
-        # Check if refresh token exists in database
-        refresh_token_db = (
-            db.query(RefreshToken)
-            .filter(
-                RefreshToken.token == token_data.refresh_token,
-                RefreshToken.user_id == user_id,
-            )
-            .first()
+        # New tokens keep the version of the token they replace, which
+        # verify_token has just checked is current
+        version = payload.get("ver")
+        if version is None:
+            version = token_versions.current(db, user_id)
+        access_token = create_access_token(data={"sub": str(user_id), "ver": version})
+        new_refresh_token = create_refresh_token(
+            data={"sub": str(user_id), "ver": version}
         )
 
-        if not refresh_token_db:
+        # Swap the stored token in one statement; it only matches an
+        # unexpired token of an active user
+        expires_at = datetime.now(timezone.utc) + timedelta(
+            days=REFRESH_TOKEN_EXPIRE_DAYS
+        )
+        if not rotate_refresh_token(
+            db, user_id, token_data.refresh_token, new_refresh_token, expires_at
+        ):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
             )
 
-        # Check if token is expired
-        if refresh_token_db.expires_at < datetime.now(timezone.utc):
-            invalidate_refresh_token(db, token_data.refresh_token)
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired"
-            )
-
-        # Get user
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found or inactive",
-            )
-
-        # Create new tokens
-        access_token = create_access_token(data={"sub": str(user.id)})
-        new_refresh_token = create_refresh_token(data={"sub": str(user.id)})
-
-        # Invalidate old refresh token
-        invalidate_refresh_token(db, token_data.refresh_token)
-
-        # Save new refresh token
-        expires_at = datetime.now(timezone.utc) + timedelta(
-            days=REFRESH_TOKEN_EXPIRE_DAYS
+        create_audit_log(
+            db, user_id, "token_refresh", None, True, request, commit=False
         )
-        save_refresh_token(db, user.id, new_refresh_token, expires_at)
+        db.commit()
 
         # Update refresh token cookie
         response.set_cookie(
@@ -298,13 +299,12 @@ async def refresh_token(
             max_age=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
         )
 
-        create_audit_log(db, user.id, "token_refresh", None, True, request)
-
         return Token(access_token=access_token, refresh_token=new_refresh_token)
 
     except HTTPException:
         raise
     except Exception as e:
+        db.rollback()
         create_audit_log(
             db, None, "token_refresh", None, False, request, {"error": str(e)}
         )
@@ -0,0 +1,69 @@
+"""Parquet snapshot export endpoints for offline analytics."""
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Path, Query
+from fastapi.responses import FileResponse
+from typing import List, Optional
+
+from auth import get_current_user, get_current_active_superuser
+from parquet_export import (
+    EXPORT_TABLES,
+    check_available,
+    export_lock,
+    list_snapshots,
+    run_export_job,
+    snapshot_path,
+)
+import models
+import schemas
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[schemas.ParquetSnapshot])
+def get_snapshots(current_user: models.User = Depends(get_current_user)):
+    """List the exported Parquet snapshot files."""
+    return list_snapshots()
+
+
+@router.get("/{table}/{month}")
+def download_snapshot(
+    table: str,
+    month: str = Path(..., pattern=r"^\d{4}-\d{2}$"),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Download one monthly snapshot file. Supports HTTP range requests."""
+    path = snapshot_path(table, month)
+    if table not in EXPORT_TABLES or not path.is_file():
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return FileResponse(
+        path,
+        media_type="application/vnd.apache.parquet",
+        filename=f"{table}_{month}.parquet",
+    )
+
+
+@router.post("/run", status_code=202)
+def run_export(
+    background_tasks: BackgroundTasks,
+    table: Optional[List[str]] = Query(default=None),
+    current_user: models.User = Depends(get_current_active_superuser),
+):
+    """
+    Start bringing the snapshots up to date in the background, rewriting only
+    months that changed. An export can take minutes; its outcome is logged
+    and the new files show up in GET /api/exports/.
+    """
+    unknown = [name for name in table or [] if name not in EXPORT_TABLES]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown tables: {', '.join(unknown)}"
+        )
+    try:
+        check_available()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    if not export_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="An export is already running")
+    background_tasks.add_task(run_export_job, table)
+    return {"status": "started", "tables": table or list(EXPORT_TABLES)}
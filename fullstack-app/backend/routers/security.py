@@ -1,12 +1,17 @@
 """Security monitoring and scanning API endpoints."""
 
-from fastapi import APIRouter, Depends, Query
+import ipaddress
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, cast, func
+from sqlalchemy.dialects.postgresql import INET
 from typing import List, Dict, Optional
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from audit_actions import LOGIN_ACTIONS
 from database import get_db
+from models import AuditLog, User
 from auth import get_current_active_superuser
-from security.monitoring import SecurityMonitor, SecurityScanner
+from security.monitoring import SecurityMonitor, SecurityScanner, security_detector
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -133,6 +138,145 @@ def get_suspicious_patterns(db: Session = Depends(get_db)):
     }
 
 
+def _parse_network(cidr: str) -> str:
+    try:
+        return str(ipaddress.ip_network(cidr, strict=False))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid network: {cidr}")
+
+
+def _within(network: str):
+    """ip_address <<= network, with the network bound as inet for the index."""
+    return AuditLog.ip_address.op("<<=")(cast(network, INET))
+
+
+@router.get("/investigate/subnet", dependencies=[Depends(get_current_active_superuser)])
+def investigate_subnet(
+    cidr: str = Query(..., description="Network to search, e.g. 203.0.113.0/24"),
+    hours: int = Query(default=24, ge=1, le=720),
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """Audit events from any address inside a network, newest first."""
+    network = _parse_network(cidr)
+    window_start = datetime.now(timezone.utc) - timedelta(hours=hours)
+
+    # <<= (is contained by or equals) is served by the GiST inet_ops index
+    rows = (
+        db.query(AuditLog, User.username)
+        .outerjoin(User, AuditLog.user_id == User.id)
+        .filter(
+            and_(
+                _within(network),
+                AuditLog.created_at >= window_start,
+            )
+        )
+        .order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+    return {
+        "network": network,
+        "window_hours": hours,
+        "events": [
+            {
+                "id": log.id,
+                "user_id": log.user_id,
+                "username": username,
+                "action": log.action,
+                "resource": log.resource,
+                "status": log.success,
+                "ip_address": str(log.ip_address),
+                "created_at": log.created_at,
+            }
+            for log, username in rows
+        ],
+        "count": len(rows),
+    }
+
+
+@router.get(
+    "/investigate/subnets", dependencies=[Depends(get_current_active_superuser)]
+)
+def aggregate_subnets(
+    hours: int = Query(default=24, ge=1, le=720),
+    prefix: int = Query(default=24, ge=8, le=32, description="IPv4 prefix length"),
+    prefix_v6: int = Query(default=64, ge=16, le=128, description="IPv6 prefix"),
+    cidr: Optional[str] = Query(default=None, description="Only inside this network"),
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """Audit activity per subnet over a time window, busiest first."""
+    window_start = datetime.now(timezone.utc) - timedelta(hours=hours)
+
+    subnet = func.network(
+        func.set_masklen(
+            AuditLog.ip_address,
+            case((func.family(AuditLog.ip_address) == 4, prefix), else_=prefix_v6),
+        )
+    )
+    filters = [AuditLog.ip_address.isnot(None), AuditLog.created_at >= window_start]
+    if cidr:
+        filters.append(_within(_parse_network(cidr)))
+
+    events = func.count()
+    rows = (
+        db.query(
+            subnet,
+            events,
+            events.filter(AuditLog.success.is_(False)),
+            events.filter(AuditLog.action.in_(LOGIN_ACTIONS)),
+            func.count(func.distinct(AuditLog.ip_address)),
+            func.count(func.distinct(AuditLog.user_id)),
+            func.min(AuditLog.created_at),
+            func.max(AuditLog.created_at),
+        )
+        .filter(and_(*filters))
+        .group_by(subnet)
+        .order_by(events.desc())
+        .limit(limit)
+        .all()
+    )
+
+    return {
+        "window_hours": hours,
+        "subnets": [
+            {
+                "subnet": str(network),
+                "events": count,
+                "failed": failed,
+                "logins": logins,
+                "addresses": addresses,
+                "users": users,
+                "first_seen": first_seen,
+                "last_seen": last_seen,
+            }
+            for (
+                network,
+                count,
+                failed,
+                logins,
+                addresses,
+                users,
+                first_seen,
+                last_seen,
+            ) in rows
+        ],
+    }
+
+
+@router.get("/alerts/recent", dependencies=[Depends(get_current_active_superuser)])
+def get_recent_alerts():
+    """Alerts raised by the streaming detector in this worker, newest first."""
+    alerts = security_detector.recent_alerts()
+    return {
+        "timestamp": datetime.now(timezone.utc),
+        "alerts": alerts,
+        "count": len(alerts),
+    }
+
+
 @router.get(
     "/scan/weak-passwords", dependencies=[Depends(get_current_active_superuser)]
 )
@@ -260,9 +404,6 @@ def security_dashboard(db: Session = Depends(get_db)):
     privilege_changes = scanner.check_privilege_escalation()
 
     # Get recent security alerts from audit log
-    from sqlalchemy import and_
-    from models import AuditLog
-
     recent_alerts = (
         db.query(AuditLog)
         .filter(
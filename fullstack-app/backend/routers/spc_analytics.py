@@ -0,0 +1,655 @@
+"""Server-side analytics endpoints across SPC monitors."""
+
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy import and_, func, true
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, datetime
+import numpy as np
+
+from database import get_read_db
+from auth import get_current_user_optional
+from analytics import (
+    CHART_TYPES,
+    correlation_matrix,
+    least_squares_by_group,
+    finite_or_none,
+    matrix_to_lists,
+    imr_chart,
+    ewma_chart,
+    cusum_chart,
+    group_bounds,
+    one_way_anova,
+    kruskal_wallis,
+    pairwise_offsets,
+    fleet_offsets,
+)
+from spc_query import (
+    ORDINAL_COLUMNS,
+    get_spc_model,
+    get_metric_columns,
+    clamp_guest_date_range,
+    build_spc_filters,
+    validate_columns,
+    load_metric_arrays,
+    metric_matrix,
+)
+from duckdb_mirror import duckdb_mirror
+from hot_store import hot_store, value_distribution
+from spc_rollups import BUCKETS, query_buckets
+from query_cache import query_cache
+import models
+import schemas
+
+router = APIRouter()
+
+
+def _fit_to_dict(label: str, fit: dict, index: int) -> dict:
+    return {
+        "entity": label,
+        "n": int(fit["n"][index]),
+        "slope": finite_or_none(fit["slope"][index]),
+        "intercept": finite_or_none(fit["intercept"][index]),
+        "r_squared": finite_or_none(fit["r_squared"][index]),
+    }
+
+
+def _list_or_none(values: np.ndarray) -> list:
+    return [finite_or_none(v) for v in values]
+
+
+@router.get("/correlation", response_model=schemas.SPCCorrelationResponse)
+def get_correlation(
+    spc_monitor_name: str,
+    metrics: List[str] = Query(..., description="Metric columns to correlate"),
+    method: str = Query(default="pearson", pattern="^(pearson|spearman)$"),
+    x_metric: Optional[str] = None,
+    y_metric: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    entity: Optional[List[str]] = Query(default=None),
+    process_type: Optional[List[str]] = Query(default=None),
+    product_type: Optional[List[str]] = Query(default=None),
+    db: Session = Depends(get_read_db),
+    current_user: Optional[models.User] = Depends(get_current_user_optional),
+):
+    """
+    Correlation matrix across metric columns plus per-entity least-squares
+    fits of y_metric on x_metric. Defaults to the first two metrics.
+    """
+    model = get_spc_model(spc_monitor_name)
+    allowed = get_metric_columns(model) + list(ORDINAL_COLUMNS)
+    metrics = validate_columns(model, metrics, allowed)
+    if len(metrics) < 2:
+        raise HTTPException(
+            status_code=400, detail="At least two distinct metrics are required"
+        )
+
+    x_metric = x_metric or metrics[0]
+    y_metric = y_metric or metrics[1]
+    for name in (x_metric, y_metric):
+        if name not in metrics:
+            raise HTTPException(
+                status_code=400, detail=f"{name} must be one of the requested metrics"
+            )
+
+    start_date, end_date = clamp_guest_date_range(start_date, end_date, current_user)
+    filters = build_spc_filters(
+        model, start_date, end_date, entity, process_type, product_type
+    )
+
+    if duckdb_mirror.available(model):
+        arrays = duckdb_mirror.fetch_columns(
+            model,
+            ["entity"] + metrics,
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+        )
+        entities, values = metric_matrix(
+            arrays["entity"], [arrays[name] for name in metrics], metrics
+        )
+    else:
+        entities, values = load_metric_arrays(db, model, metrics, filters)
+    n_rows = len(entities)
+
+    if n_rows < 2:
+        nan_matrix = np.full((len(metrics), len(metrics)), np.nan)
+        return {
+            "spc_monitor_name": spc_monitor_name,
+            "method": method,
+            "metrics": metrics,
+            "n": n_rows,
+            "matrix": matrix_to_lists(nan_matrix),
+            "x_metric": x_metric,
+            "y_metric": y_metric,
+            "overall_fit": None,
+            "fits": [],
+        }
+
+    matrix = correlation_matrix(values, method)
+
+    # Per-entity fits in one vectorized pass, plus the pooled fit
+    labels, codes = np.unique(entities, return_inverse=True)
+    x = values[:, metrics.index(x_metric)]
+    y = values[:, metrics.index(y_metric)]
+    fits = least_squares_by_group(x, y, codes, len(labels))
+    pooled = least_squares_by_group(x, y, np.zeros(n_rows, dtype=int), 1)
+
+    return {
+        "spc_monitor_name": spc_monitor_name,
+        "method": method,
+        "metrics": metrics,
+        "n": n_rows,
+        "matrix": matrix_to_lists(matrix),
+        "x_metric": x_metric,
+        "y_metric": y_metric,
+        "overall_fit": _fit_to_dict("ALL", pooled, 0),
+        "fits": [_fit_to_dict(str(label), fits, i) for i, label in enumerate(labels)],
+    }
+
+
+@router.get("/buckets", response_model=schemas.SPCBucketResponse)
+async def get_buckets(
+    spc_monitor_name: str,
+    metric: str,
+    bucket: str = Query(default="day", pattern=f"^({'|'.join(BUCKETS)})$"),
+    by_entity: bool = False,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    entity: Optional[List[str]] = Query(default=None),
+    process_type: Optional[List[str]] = Query(default=None),
+    product_type: Optional[List[str]] = Query(default=None),
+    db: Session = Depends(get_read_db),
+    current_user: Optional[models.User] = Depends(get_current_user_optional),
+):
+    """
+    Count, mean, min, max and stddev of one metric per hour, shift, day or
+    week, optionally split by entity. Served from the hourly rollups plus
+    any newer raw rows.
+    """
+    model = get_spc_model(spc_monitor_name)
+    validate_columns(model, [metric], get_metric_columns(model))
+    start_date, end_date = clamp_guest_date_range(start_date, end_date, current_user)
+
+    def run_query(db: Session):
+        return query_buckets(
+            db,
+            model,
+            metric,
+            bucket,
+            by_entity,
+            start_date,
+            end_date,
+            entity,
+            process_type,
+            product_type,
+        )
+
+    buckets = await query_cache.get_or_compute_async(
+        db,
+        model,
+        f"{model.__tablename__}:buckets",
+        dict(
+            metric=metric,
+            bucket=bucket,
+            by_entity=by_entity,
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+        ),
+        run_query,
+    )
+    return {
+        "spc_monitor_name": spc_monitor_name,
+        "metric": metric,
+        "bucket": bucket,
+        "buckets": buckets,
+    }
+
+
+DEFAULT_PERCENTILES = [1.0, 5.0, 25.0, 50.0, 75.0, 95.0, 99.0]
+
+
+def _percentile_key(percentile: float) -> str:
+    return f"p{percentile:g}"
+
+
+@router.get("/distribution", response_model=schemas.SPCDistributionResponse)
+async def get_distribution(
+    spc_monitor_name: str,
+    metric: str,
+    bins: int = Query(default=20, ge=1, le=200),
+    percentiles: List[float] = Query(default=DEFAULT_PERCENTILES),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    entity: Optional[List[str]] = Query(default=None),
+    process_type: Optional[List[str]] = Query(default=None),
+    product_type: Optional[List[str]] = Query(default=None),
+    db: Session = Depends(get_read_db),
+    current_user: Optional[models.User] = Depends(get_current_user_optional),
+):
+    """
+    Percentiles and an equal-width histogram of one metric. Served from the
+    in-memory hot store or the DuckDB mirror when they cover the request,
+    otherwise aggregated in Postgres.
+    """
+    model = get_spc_model(spc_monitor_name)
+    validate_columns(model, [metric], get_metric_columns(model))
+    percentiles = sorted(set(percentiles))
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise HTTPException(
+            status_code=400, detail="Percentiles must be between 0 and 100"
+        )
+    quantiles = [p / 100 for p in percentiles]
+    start_date, end_date = clamp_guest_date_range(start_date, end_date, current_user)
+
+    def run_query(db: Session):
+        columns = hot_store.select(
+            model,
+            [metric],
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+        )
+        if columns is not None:
+            result = value_distribution(columns[metric], quantiles, bins)
+            return {**result, "engine": "memory"}
+
+        if duckdb_mirror.available(model):
+            result = duckdb_mirror.distribution(
+                model,
+                metric,
+                quantiles,
+                bins,
+                start_date=start_date,
+                end_date=end_date,
+                entity=entity,
+                process_type=process_type,
+                product_type=product_type,
+            )
+            return {**result, "engine": "duckdb"}
+
+        column = getattr(model, metric)
+        filters = build_spc_filters(
+            model, start_date, end_date, entity, process_type, product_type
+        )
+        condition = and_(*filters, column.isnot(None))
+
+        n, low, high, *values = (
+            db.query(
+                func.count(column),
+                func.min(column),
+                func.max(column),
+                *[func.percentile_cont(q).within_group(column) for q in quantiles],
+            )
+            .filter(condition)
+            .one()
+        )
+        if not n:
+            return {
+                "n": 0,
+                "min": None,
+                "max": None,
+                "quantiles": [],
+                "counts": [],
+                "engine": "postgres",
+            }
+
+        width = (high - low) / bins or 1.0
+        index = func.least(func.floor((column - low) / width), bins - 1)
+        counts = [0] * bins
+        for bin_index, count in (
+            db.query(index, func.count()).filter(condition).group_by(index).all()
+        ):
+            counts[int(bin_index)] = count
+        return {
+            "n": n,
+            "min": low,
+            "max": high,
+            "quantiles": values,
+            "counts": counts,
+            "engine": "postgres",
+        }
+
+    result = await query_cache.get_or_compute_async(
+        db,
+        model,
+        f"{model.__tablename__}:distribution",
+        dict(
+            metric=metric,
+            bins=bins,
+            percentiles=percentiles,
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+        ),
+        run_query,
+    )
+
+    edges = []
+    if result["n"]:
+        width = (result["max"] - result["min"]) / bins
+        edges = [float(result["min"] + width * i) for i in range(bins + 1)]
+    return {
+        "spc_monitor_name": spc_monitor_name,
+        "metric": metric,
+        "n": result["n"],
+        "min": result["min"],
+        "max": result["max"],
+        "percentiles": {
+            _percentile_key(p): finite_or_none(v)
+            for p, v in zip(percentiles, result["quantiles"])
+        },
+        "histogram": {"edges": edges, "counts": result["counts"]},
+        "engine": result["engine"],
+    }
+
+
+@router.get("/control-chart", response_model=schemas.SPCControlChartResponse)
+async def get_control_chart(
+    spc_monitor_name: str,
+    metric: str,
+    chart: str = Query(default="imr", pattern=f"^({'|'.join(CHART_TYPES)})$"),
+    lam: float = Query(default=0.2, ge=0.01, le=1, alias="lambda"),
+    k: float = Query(default=0.5, ge=0, description="CUSUM allowance in sigmas"),
+    h: float = Query(default=5.0, gt=0, description="CUSUM decision interval"),
+    width: float = Query(default=3.0, gt=0, description="Limit width in sigmas"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    entity: Optional[List[str]] = Query(default=None),
+    process_type: Optional[List[str]] = Query(default=None),
+    product_type: Optional[List[str]] = Query(default=None),
+    db: Session = Depends(get_read_db),
+    current_user: Optional[models.User] = Depends(get_current_user_optional),
+):
+    """
+    I-MR, EWMA or tabular CUSUM series of one metric per entity, in process
+    order, with control limits estimated from the average moving range.
+    """
+    model = get_spc_model(spc_monitor_name)
+    validate_columns(model, [metric], get_metric_columns(model))
+    start_date, end_date = clamp_guest_date_range(start_date, end_date, current_user)
+    parameters = {
+        "imr": {"width": width},
+        "ewma": {"lambda": lam, "width": width},
+        "cusum": {"k": k, "h": h},
+    }[chart]
+
+    def run_query(db: Session):
+        columns = hot_store.select(
+            model,
+            ["entity", "date_process", "lot", metric],
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+        )
+        if columns is not None:
+            order = np.lexsort(
+                (columns["lot"], columns["date_process"], columns["entity"])
+            )
+            entities = columns["entity"][order]
+            dates = columns["date_process"][order].astype(datetime).tolist()
+            lots = columns["lot"][order].tolist()
+            values = columns[metric][order]
+        else:
+            filters = build_spc_filters(
+                model, start_date, end_date, entity, process_type, product_type
+            )
+            query = db.query(
+                model.entity, model.date_process, model.lot, getattr(model, metric)
+            )
+            if filters:
+                query = query.filter(and_(*filters))
+            rows = query.order_by(model.entity, model.date_process, model.lot).all()
+            if not rows:
+                return []
+
+            entities, dates, lots, values = zip(*rows)
+            entities = np.array(entities, dtype=object)
+            values = np.array(values, dtype=float)
+        if len(values) == 0:
+            return []
+
+        series = []
+        for start, stop in group_bounds(entities):
+            x = values[start:stop]
+            if chart == "ewma":
+                statistics, limits = ewma_chart(x, lam, width)
+            elif chart == "cusum":
+                statistics, limits = cusum_chart(x, k, h)
+            else:
+                statistics, limits = imr_chart(x, width)
+            series.append(
+                {
+                    "entity": entities[start],
+                    "n": stop - start,
+                    "date_process": list(dates[start:stop]),
+                    "lot": list(lots[start:stop]),
+                    "value": x.tolist(),
+                    "statistics": {
+                        name: _list_or_none(stat) for name, stat in statistics.items()
+                    },
+                    "limits": {
+                        name: finite_or_none(limit) for name, limit in limits.items()
+                    },
+                }
+            )
+        return series
+
+    series = await query_cache.get_or_compute_async(
+        db,
+        model,
+        f"{model.__tablename__}:control_chart",
+        dict(
+            metric=metric,
+            chart=chart,
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+            **parameters,
+        ),
+        run_query,
+    )
+    return {
+        "spc_monitor_name": spc_monitor_name,
+        "metric": metric,
+        "chart": chart,
+        "parameters": parameters,
+        "series": series,
+    }
+
+
+@router.get("/change-points", response_model=List[schemas.SPCChangePoint])
+def get_change_points(
+    spc_monitor_name: str,
+    metric: Optional[List[str]] = Query(default=None),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    entity: Optional[List[str]] = Query(default=None),
+    process_type: Optional[List[str]] = Query(default=None),
+    product_type: Optional[List[str]] = Query(default=None),
+    db: Session = Depends(get_read_db),
+    current_user: Optional[models.User] = Depends(get_current_user_optional),
+):
+    """Detected mean shifts per tool series, oldest first, for chart overlays."""
+    model = get_spc_model(spc_monitor_name)
+    start_date, end_date = clamp_guest_date_range(start_date, end_date, current_user)
+    change_point = models.SPCChangePoint
+
+    filters = build_spc_filters(
+        change_point,
+        start_date,
+        end_date,
+        entity,
+        process_type,
+        product_type,
+    )
+    filters.append(change_point.source_table == model.__tablename__)
+    if metric:
+        metrics = validate_columns(model, metric, get_metric_columns(model))
+        filters.append(change_point.metric.in_(metrics))
+
+    return (
+        db.query(change_point)
+        .filter(and_(*filters))
+        .order_by(change_point.date_process, change_point.metric)
+        .all()
+    )
+
+
+def _offset_to_dict(offset: dict) -> dict:
+    return {
+        "entity_a": offset["entity_a"],
+        "entity_b": offset["entity_b"],
+        "offset": finite_or_none(offset["offset"]),
+        "t": finite_or_none(offset["t"]),
+        "df": finite_or_none(offset["df"]),
+        "p_value": finite_or_none(offset["p_value"], 12),
+        "p_adjusted": finite_or_none(offset["p_adjusted"], 12),
+    }
+
+
+@router.get("/tool-matching", response_model=schemas.SPCToolMatchingResponse)
+async def get_tool_matching(
+    spc_monitor_name: str,
+    metric: str,
+    test: str = Query(default="anova", pattern="^(anova|kruskal)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    entity: Optional[List[str]] = Query(default=None),
+    process_type: Optional[List[str]] = Query(default=None),
+    product_type: Optional[List[str]] = Query(default=None),
+    db: Session = Depends(get_read_db),
+    current_user: Optional[models.User] = Depends(get_current_user_optional),
+):
+    """
+    Whether entities run offset from each other on a metric: one-way ANOVA
+    or Kruskal-Wallis across entities, Welch tests of each entity against
+    the rest of the fleet, and Holm-adjusted pairwise Welch tests. Only
+    per-entity aggregates leave the database.
+    """
+    model = get_spc_model(spc_monitor_name)
+    validate_columns(model, [metric], get_metric_columns(model))
+    start_date, end_date = clamp_guest_date_range(start_date, end_date, current_user)
+
+    def run_query(db: Session):
+        column = getattr(model, metric)
+        filters = build_spc_filters(
+            model, start_date, end_date, entity, process_type, product_type
+        )
+        condition = and_(*filters) if filters else true()
+
+        rows = (
+            db.query(
+                model.entity,
+                func.count(column),
+                func.sum(column),
+                func.sum(column * column),
+            )
+            .filter(condition)
+            .group_by(model.entity)
+            .order_by(model.entity)
+            .all()
+        )
+        labels = [row[0] for row in rows]
+        n = np.array([row[1] for row in rows], dtype=float)
+        total = np.array([row[2] or 0 for row in rows], dtype=float)
+        total_sq = np.array([row[3] or 0 for row in rows], dtype=float)
+
+        mean_ranks = {}
+        if test == "kruskal":
+            # Average ranks over the whole window; ties share their mean rank
+            ties = func.count().over(partition_by=column)
+            ranked = (
+                db.query(
+                    model.entity.label("entity"),
+                    (func.rank().over(order_by=column) + (ties - 1) / 2.0).label(
+                        "rank"
+                    ),
+                    ties.label("ties"),
+                )
+                .filter(condition)
+                .subquery()
+            )
+            rank_rows = (
+                db.query(
+                    ranked.c.entity,
+                    func.sum(ranked.c.rank),
+                    func.sum(ranked.c.ties * ranked.c.ties - 1),
+                )
+                .group_by(ranked.c.entity)
+                .all()
+            )
+            rank_sums = {row[0]: float(row[1]) for row in rank_rows}
+            tie_term = float(sum(row[2] for row in rank_rows))
+            rank_sum = np.array([rank_sums[label] for label in labels])
+            omnibus = kruskal_wallis(n, rank_sum, tie_term)
+            mean_ranks = dict(zip(labels, rank_sum / n))
+        else:
+            omnibus = one_way_anova(n, total, total_sq)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = total / n
+            stddevs = np.sqrt(np.maximum(total_sq - total * means, 0.0) / (n - 1))
+
+        return {
+            "groups": [
+                {
+                    "entity": label,
+                    "n": int(n[i]),
+                    "mean": finite_or_none(means[i]),
+                    "stddev": finite_or_none(stddevs[i]) if n[i] > 1 else None,
+                    "mean_rank": finite_or_none(mean_ranks.get(label)),
+                }
+                for i, label in enumerate(labels)
+            ],
+            "omnibus": {
+                "test": test,
+                "statistic": finite_or_none(omnibus["statistic"]),
+                "df": [finite_or_none(df) for df in omnibus["df"]],
+                "p_value": finite_or_none(omnibus["p_value"], 12),
+            },
+            "versus_fleet": [
+                _offset_to_dict(offset)
+                for offset in fleet_offsets(labels, n, total, total_sq)
+            ],
+            "pairwise": [
+                _offset_to_dict(offset)
+                for offset in pairwise_offsets(labels, n, total, total_sq)
+            ],
+        }
+
+    result = await query_cache.get_or_compute_async(
+        db,
+        model,
+        f"{model.__tablename__}:tool_matching",
+        dict(
+            metric=metric,
+            test=test,
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+        ),
+        run_query,
+    )
+    return {
+        "spc_monitor_name": spc_monitor_name,
+        "metric": metric,
+        "test": test,
+        **result,
+    }
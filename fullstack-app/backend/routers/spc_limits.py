@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, desc
 from typing import List, Optional
 from datetime import datetime, date
-from database import get_db
+from database import get_db, get_read_db
 import models
 import schemas
 
@@ -17,7 +17,7 @@ def get_spc_limits(
     spc_monitor_name: Optional[str] = None,
     spc_chart_name: Optional[str] = None,
     effective_date: Optional[date] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get SPC limits with optional filters. Returns the most recent limit for each combination."""
     query = db.query(models.SPCLimits)
@@ -52,7 +52,7 @@ def get_current_spc_limits(
     product_type: Optional[str] = None,
     spc_monitor_name: Optional[str] = None,
     spc_chart_name: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get the current (most recent) SPC limits for each unique combination."""
     # Subquery to get the max effective_date for each combination
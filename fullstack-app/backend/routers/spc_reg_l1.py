@@ -1,241 +1,299 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from typing import List, Optional
-from datetime import datetime, date, timedelta
-from database import get_db
+from datetime import date
+from database import get_read_db
 from auth import get_current_user_optional
+from query_cache import query_cache
+from guest_snapshot import guest_snapshot, aggregate_rows
+from duckdb_mirror import duckdb_mirror
+from hot_store import hot_store, aggregate_columns
+from spc_query import (
+    clamp_guest_date_range,
+    build_spc_filters,
+    build_order_by,
+    sort_rows,
+    stats_columns,
+    format_stats,
+    count_total,
+    parse_fields,
+    project_rows,
+    paged_response,
+)
 import models
 import schemas
 
 router = APIRouter()
 
+# Aggregates returned by /stats as (label, function, column, decimals)
+STATS_SPEC = [
+    ("avg_scale_x", "avg", "scale_x", 6),
+    ("min_scale_x", "min", "scale_x", 6),
+    ("max_scale_x", "max", "scale_x", 6),
+    ("avg_scale_y", "avg", "scale_y", 6),
+    ("avg_ortho", "avg", "ortho", 6),
+    ("avg_centrality_x", "avg", "centrality_x", 2),
+    ("avg_centrality_y", "avg", "centrality_y", 2),
+    ("avg_centrality_rotation", "avg", "centrality_rotation", 6),
+]
+
 
 @router.get("/", response_model=List[schemas.SPCRegL1])
 async def get_spc_reg_l1_data(
+    response: Response,
     skip: int = 0,
     limit: int = Query(default=100, le=1000),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    entity: Optional[str] = None,
-    process_type: Optional[str] = None,
-    product_type: Optional[str] = None,
+    entity: Optional[List[str]] = Query(default=None),
+    process_type: Optional[List[str]] = Query(default=None),
+    product_type: Optional[List[str]] = Query(default=None),
     spc_monitor_name: Optional[str] = None,
-    db: Session = Depends(get_db),
+    fields: Optional[List[str]] = Query(
+        default=None, description="Columns to return, e.g. date_process,entity,lot"
+    ),
+    sort_by: Optional[str] = None,
+    sort_order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    db: Session = Depends(get_read_db),
     current_user: Optional[models.User] = Depends(get_current_user_optional),
 ):
-    # For unauthenticated users (guests), enforce 30-day limit
-    if not current_user:
-        today = date.today()
-        thirty_days_ago = today - timedelta(days=30)
-
-        # Override dates for guests
-        if not start_date or start_date < thirty_days_ago:
-            start_date = thirty_days_ago
-        if not end_date or end_date > today:
-            end_date = today
-
-        # Validate guest date range
-        if start_date < thirty_days_ago or end_date > today:
-            raise HTTPException(
-                status_code=403,
-                detail="Guest access is limited to the past 30 days of data",
-            )
+    fields = parse_fields(models.SPCRegL1, fields)
+    order_by = build_order_by(models.SPCRegL1, sort_by, sort_order)
 
-    query = db.query(models.SPCRegL1)
+    # For unauthenticated users (guests), enforce 30-day limit
+    start_date, end_date = clamp_guest_date_range(start_date, end_date, current_user)
 
-    # Apply filters
-    filters = []
-    if start_date:
-        filters.append(
-            models.SPCRegL1.date_process
-            >= datetime.combine(start_date, datetime.min.time())
+    # Guests are served from the precomputed 30-day snapshot when it is ready
+    if not current_user:
+        rows = guest_snapshot.query(
+            models.SPCRegL1,
+            start_date,
+            end_date,
+            entity,
+            process_type,
+            product_type,
+            spc_monitor_name,
         )
-    if end_date:
-        filters.append(
-            models.SPCRegL1.date_process
-            <= datetime.combine(end_date, datetime.max.time())
+        if rows is not None:
+            rows = sort_rows(rows, sort_by, sort_order)
+            page_rows = rows[skip : skip + limit]
+            if fields:
+                page_rows = project_rows(page_rows, fields)
+            return paged_response(response, page_rows, len(rows), True, fields)
+
+    def run_query(db: Session):
+        # Select only the projected columns when fields= is given
+        if fields:
+            query = db.query(*[getattr(models.SPCRegL1, name) for name in fields])
+        else:
+            query = db.query(models.SPCRegL1)
+
+        # Apply filters
+        filters = build_spc_filters(
+            models.SPCRegL1,
+            start_date,
+            end_date,
+            entity,
+            process_type,
+            product_type,
+            spc_monitor_name,
         )
-    if entity:
-        filters.append(models.SPCRegL1.entity == entity)
-    if process_type:
-        filters.append(models.SPCRegL1.process_type == process_type)
-    if product_type:
-        filters.append(models.SPCRegL1.product_type == product_type)
-    if spc_monitor_name:
-        filters.append(models.SPCRegL1.spc_monitor_name == spc_monitor_name)
-
-    if filters:
-        query = query.filter(and_(*filters))
-
-    # Sort by date_process descending (newest first)
-    query = query.order_by(models.SPCRegL1.date_process.desc())
+        if filters:
+            query = query.filter(and_(*filters))
+
+        # Sort by the requested column (default: newest first)
+        query = query.order_by(*order_by)
+
+        # Apply pagination
+        rows = query.offset(skip).limit(limit).all()
+        total, total_exact = count_total(
+            db,
+            models.SPCRegL1,
+            filters,
+            start_date,
+            end_date,
+            skip,
+            limit,
+            len(rows),
+        )
+        if fields:
+            items = [dict(zip(fields, row)) for row in rows]
+        else:
+            items = [schemas.SPCRegL1.model_validate(row).model_dump() for row in rows]
+        return {
+            "items": items,
+            "total": total,
+            "total_exact": total_exact,
+        }
 
-    # Apply pagination and return
-    spc_reg_l1_data = query.offset(skip).limit(limit).all()
-    return spc_reg_l1_data
+    page = await query_cache.get_or_compute_async(
+        db,
+        models.SPCRegL1,
+        "spc_reg_l1:list",
+        dict(
+            skip=skip,
+            limit=limit,
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+            spc_monitor_name=spc_monitor_name,
+            fields=fields,
+            sort_by=sort_by,
+            sort_order=sort_order,
+        ),
+        run_query,
+    )
+    return paged_response(
+        response, page["items"], page["total"], page["total_exact"], fields
+    )
 
 
 @router.get("/stats")
 async def get_spc_reg_l1_stats(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    entity: Optional[str] = None,
-    process_type: Optional[str] = None,
-    product_type: Optional[str] = None,
+    entity: Optional[List[str]] = Query(default=None),
+    process_type: Optional[List[str]] = Query(default=None),
+    product_type: Optional[List[str]] = Query(default=None),
     spc_monitor_name: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: Optional[models.User] = Depends(get_current_user_optional),
 ):
     # For unauthenticated users (guests), enforce 30-day limit
-    if not current_user:
-        today = date.today()
-        thirty_days_ago = today - timedelta(days=30)
-
-        # Override dates for guests
-        if not start_date or start_date < thirty_days_ago:
-            start_date = thirty_days_ago
-        if not end_date or end_date > today:
-            end_date = today
-
-        # Validate guest date range
-        if start_date < thirty_days_ago or end_date > today:
-            raise HTTPException(
-                status_code=403,
-                detail="Guest access is limited to the past 30 days of data",
-            )
+    start_date, end_date = clamp_guest_date_range(start_date, end_date, current_user)
 
-    query = db.query(models.SPCRegL1)
-
-    # Apply filters
-    filters = []
-    if start_date:
-        filters.append(
-            models.SPCRegL1.date_process
-            >= datetime.combine(start_date, datetime.min.time())
+    if not current_user:
+        rows = guest_snapshot.query(
+            models.SPCRegL1,
+            start_date,
+            end_date,
+            entity,
+            process_type,
+            product_type,
+            spc_monitor_name,
         )
-    if end_date:
-        filters.append(
-            models.SPCRegL1.date_process
-            <= datetime.combine(end_date, datetime.max.time())
+        if rows is not None:
+            return format_stats(aggregate_rows(rows, STATS_SPEC), STATS_SPEC)
+
+    def run_query(db: Session):
+        # Hot combinations are held as in-memory columns
+        columns = hot_store.select(
+            models.SPCRegL1,
+            ["lot"] + [column for _, _, column, _ in STATS_SPEC],
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+            spc_monitor_name=spc_monitor_name,
+        )
+        if columns is not None:
+            return format_stats(aggregate_columns(columns, STATS_SPEC), STATS_SPEC)
+
+        # Served from the columnar mirror when it is loaded
+        if duckdb_mirror.available(models.SPCRegL1):
+            values = duckdb_mirror.aggregate(
+                models.SPCRegL1,
+                STATS_SPEC,
+                start_date=start_date,
+                end_date=end_date,
+                entity=entity,
+                process_type=process_type,
+                product_type=product_type,
+                spc_monitor_name=spc_monitor_name,
+            )
+            return format_stats(values, STATS_SPEC)
+
+        # Apply filters
+        filters = build_spc_filters(
+            models.SPCRegL1,
+            start_date,
+            end_date,
+            entity,
+            process_type,
+            product_type,
+            spc_monitor_name,
         )
-    if entity:
-        filters.append(models.SPCRegL1.entity == entity)
-    if process_type:
-        filters.append(models.SPCRegL1.process_type == process_type)
-    if product_type:
-        filters.append(models.SPCRegL1.product_type == product_type)
-    if spc_monitor_name:
-        filters.append(models.SPCRegL1.spc_monitor_name == spc_monitor_name)
-
-    if filters:
-        query = query.filter(and_(*filters))
 
-    # Get statistics
-    from sqlalchemy import func
-
-    query = db.query(
-        func.count(models.SPCRegL1.lot).label("total_count"),
-        func.avg(models.SPCRegL1.scale_x).label("avg_scale_x"),
-        func.min(models.SPCRegL1.scale_x).label("min_scale_x"),
-        func.max(models.SPCRegL1.scale_x).label("max_scale_x"),
-        func.avg(models.SPCRegL1.scale_y).label("avg_scale_y"),
-        func.avg(models.SPCRegL1.ortho).label("avg_ortho"),
-        func.avg(models.SPCRegL1.centrality_x).label("avg_centrality_x"),
-        func.avg(models.SPCRegL1.centrality_y).label("avg_centrality_y"),
-        func.avg(models.SPCRegL1.centrality_rotation).label("avg_centrality_rotation"),
+        # Get statistics
+        query = db.query(*stats_columns(models.SPCRegL1, STATS_SPEC))
+
+        if filters:
+            query = query.filter(and_(*filters))
+
+        return format_stats(query.first()._asdict(), STATS_SPEC)
+
+    return await query_cache.get_or_compute_async(
+        db,
+        models.SPCRegL1,
+        "spc_reg_l1:stats",
+        dict(
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+            spc_monitor_name=spc_monitor_name,
+        ),
+        run_query,
     )
 
-    if filters:
-        query = query.filter(and_(*filters))
 
-    stats = query.first()
-
-    if not stats:
-        return {
-            "total_count": 0,
-            "avg_scale_x": 0,
-            "min_scale_x": 0,
-            "max_scale_x": 0,
-            "avg_scale_y": 0,
-            "avg_ortho": 0,
-            "avg_centrality_x": 0,
-            "avg_centrality_y": 0,
-            "avg_centrality_rotation": 0,
-        }
-
-    return {
-        "total_count": stats.total_count or 0,
-        "avg_scale_x": (
-            round(stats.avg_scale_x, 6) if stats.avg_scale_x is not None else 0
-        ),
-        "min_scale_x": (
-            round(stats.min_scale_x, 6) if stats.min_scale_x is not None else 0
-        ),
-        "max_scale_x": (
-            round(stats.max_scale_x, 6) if stats.max_scale_x is not None else 0
-        ),
-        "avg_scale_y": (
-            round(stats.avg_scale_y, 6) if stats.avg_scale_y is not None else 0
-        ),
-        "avg_ortho": round(stats.avg_ortho, 6) if stats.avg_ortho is not None else 0,
-        "avg_centrality_x": (
-            round(stats.avg_centrality_x, 2)
-            if stats.avg_centrality_x is not None
-            else 0
-        ),
-        "avg_centrality_y": (
-            round(stats.avg_centrality_y, 2)
-            if stats.avg_centrality_y is not None
-            else 0
-        ),
-        "avg_centrality_rotation": (
-            round(stats.avg_centrality_rotation, 6)
-            if stats.avg_centrality_rotation is not None
-            else 0
-        ),
-    }
+async def _distinct_values(db: Session, column) -> List[str]:
+    """Distinct values of a column, served from the query cache."""
+    return await query_cache.get_or_compute_async(
+        db,
+        models.SPCRegL1,
+        f"spc_reg_l1:distinct:{column.key}",
+        {},
+        lambda db: [row[0] for row in db.query(column).distinct().all()],
+    )
 
 
 @router.get("/entities")
-def get_entities(db: Session = Depends(get_db)):
-    entities = db.query(models.SPCRegL1.entity).distinct().all()
-    return [entity[0] for entity in entities]
+async def get_entities(db: Session = Depends(get_read_db)):
+    return await _distinct_values(db, models.SPCRegL1.entity)
 
 
 @router.get("/process-types")
-def get_process_types(db: Session = Depends(get_db)):
-    process_types = db.query(models.SPCRegL1.process_type).distinct().all()
-    return [pt[0] for pt in process_types]
+async def get_process_types(db: Session = Depends(get_read_db)):
+    return await _distinct_values(db, models.SPCRegL1.process_type)
 
 
 @router.get("/product-types")
-def get_product_types(db: Session = Depends(get_db)):
-    product_types = db.query(models.SPCRegL1.product_type).distinct().all()
-    return [pt[0] for pt in product_types]
+async def get_product_types(db: Session = Depends(get_read_db)):
+    return await _distinct_values(db, models.SPCRegL1.product_type)
 
 
 @router.get("/spc-monitor-names")
-def get_spc_monitor_names(db: Session = Depends(get_db)):
-    spc_monitor_names = db.query(models.SPCRegL1.spc_monitor_name).distinct().all()
-    return [smn[0] for smn in spc_monitor_names]
+async def get_spc_monitor_names(db: Session = Depends(get_read_db)):
+    return await _distinct_values(db, models.SPCRegL1.spc_monitor_name)
 
 
 @router.get("/process-product-combinations")
-def get_process_product_combinations(db: Session = Depends(get_db)):
+async def get_process_product_combinations(db: Session = Depends(get_read_db)):
     """Get unique combinations of process_type and product_type, sorted."""
-    combinations = (
-        db.query(models.SPCRegL1.process_type, models.SPCRegL1.product_type)
-        .distinct()
-        .all()
-    )
 
-    # Sort combinations by process_type first (as integers), then product_type alphabetically
-    sorted_combinations = sorted(combinations, key=lambda x: (int(x[0]), x[1]))
+    def run_query(db: Session):
+        combinations = (
+            db.query(models.SPCRegL1.process_type, models.SPCRegL1.product_type)
+            .distinct()
+            .all()
+        )
 
-    return [
-        {"process_type": pt, "product_type": pdt} for pt, pdt in sorted_combinations
-    ]
+        # Sort combinations by process_type first (as integers), then product_type alphabetically
+        sorted_combinations = sorted(combinations, key=lambda x: (int(x[0]), x[1]))
+
+        return [
+            {"process_type": pt, "product_type": pdt} for pt, pdt in sorted_combinations
+        ]
+
+    return await query_cache.get_or_compute_async(
+        db, models.SPCRegL1, "spc_reg_l1:combinations", {}, run_query
+    )
 
 
 @router.get("/spc-limits", response_model=List[schemas.SPCLimits])
@@ -244,7 +302,7 @@ def get_spc_limits(
     product_type: Optional[str] = None,
     spc_monitor_name: Optional[str] = None,
     spc_chart_name: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get SPC limits filtered by parameters."""
     query = db.query(models.SPCLimits)
@@ -4,7 +4,18 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from database import get_db
 from models import User
-from auth import get_password_hash
+from auth import get_password_hash, get_current_active_superuser
+from query_cache import query_cache
+from singleflight import query_flight
+from guest_snapshot import guest_snapshot
+from duckdb_mirror import duckdb_mirror
+from hot_store import hot_store
+from principal_cache import principal_cache
+from token_versions import token_versions
+from password_hashing import password_hasher
+from audit_sink import audit_sink
+from audit_actions import audit_actions
+from security.monitoring import security_detector
 import os
 import logging
 
@@ -78,3 +89,21 @@ def check_superuser(
         }
     else:
         return {"exists": False}
+
+
+@router.get("/cache-stats", dependencies=[Depends(get_current_active_superuser)])
+def get_cache_stats():
+    """Hit rates and memory use of the in-process SPC read caches and mirrors."""
+    return {
+        "query_cache": query_cache.stats(),
+        "single_flight": query_flight.stats(),
+        "guest_snapshot": guest_snapshot.stats(),
+        "duckdb_mirror": duckdb_mirror.stats(),
+        "hot_store": hot_store.stats(),
+        "principal_cache": principal_cache.stats(),
+        "token_versions": token_versions.stats(),
+        "password_hasher": password_hasher.stats(),
+        "audit_sink": audit_sink.stats(),
+        "audit_actions": audit_actions.stats(),
+        "security_detector": security_detector.stats(),
+    }
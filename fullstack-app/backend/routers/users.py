@@ -9,6 +9,8 @@ from models import User, RegistrationRequest
 from schemas import UserResponse, UserUpdate, UserCreate
 from auth import get_password_hash, create_audit_log
 from permissions import require_superuser
+from principal_cache import principal_cache
+from token_versions import token_versions
 from email_service import (
     send_registration_approved_email,
     send_registration_rejected_email,
@@ -158,6 +160,8 @@ def update_user(
     user.updated_at = datetime.now(timezone.utc)
     db.commit()
     db.refresh(user)
+    # Cached principals hold the old active/superuser state
+    principal_cache.invalidate_user(user.id)
 
     create_audit_log(
         db, current_user.id, "update_user", f"user:{user.id}", True, details=update_data
@@ -188,6 +192,8 @@ def delete_user(
 
     db.delete(user)
     db.commit()
+    principal_cache.invalidate_user(user_id)
+    token_versions.forget(user_id)
 
     create_audit_log(
         db,
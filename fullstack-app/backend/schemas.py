@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 
 # Item schemas
@@ -99,7 +99,7 @@ class RegistrationApproval(BaseModel):
 class AuditLogBase(BaseModel):
     action: str
     resource: Optional[str] = None
-    success: bool
+    status: bool
     details: Optional[Dict[str, Any]] = None
 
 
@@ -211,3 +211,134 @@ class DataStatistics(BaseModel):
     std_dev: Optional[float]
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# SPC analytics schemas
+class SPCRegressionFit(BaseModel):
+    entity: str
+    n: int
+    slope: Optional[float]
+    intercept: Optional[float]
+    r_squared: Optional[float]
+
+
+class SPCCorrelationResponse(BaseModel):
+    spc_monitor_name: str
+    method: str
+    metrics: List[str]
+    n: int
+    matrix: List[List[Optional[float]]]
+    x_metric: str
+    y_metric: str
+    overall_fit: Optional[SPCRegressionFit]
+    fits: List[SPCRegressionFit]
+
+
+class SPCBucket(BaseModel):
+    bucket_start: datetime
+    entity: Optional[str] = None
+    count: int
+    mean: Optional[float]
+    min: Optional[float]
+    max: Optional[float]
+    stddev: Optional[float]
+
+
+class SPCBucketResponse(BaseModel):
+    spc_monitor_name: str
+    metric: str
+    bucket: str
+    buckets: List[SPCBucket]
+
+
+class SPCControlChartSeries(BaseModel):
+    entity: str
+    n: int
+    date_process: List[datetime]
+    lot: List[str]
+    value: List[float]
+    statistics: Dict[str, List[Optional[float]]]
+    limits: Dict[str, Optional[float]]
+
+
+class SPCControlChartResponse(BaseModel):
+    spc_monitor_name: str
+    metric: str
+    chart: str
+    parameters: Dict[str, float]
+    series: List[SPCControlChartSeries]
+
+
+class SPCChangePoint(BaseModel):
+    metric: str
+    process_type: str
+    product_type: str
+    entity: str
+    date_process: datetime
+    lot: str
+    mean_before: float
+    mean_after: float
+    detected_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SPCEntitySummary(BaseModel):
+    entity: str
+    n: int
+    mean: Optional[float]
+    stddev: Optional[float]
+    mean_rank: Optional[float] = None
+
+
+class SPCGroupTest(BaseModel):
+    test: str
+    statistic: Optional[float]
+    df: List[Optional[float]]
+    p_value: Optional[float]
+
+
+class SPCMeanOffset(BaseModel):
+    entity_a: str
+    entity_b: str
+    offset: Optional[float]
+    t: Optional[float]
+    df: Optional[float]
+    p_value: Optional[float]
+    p_adjusted: Optional[float]
+
+
+class SPCToolMatchingResponse(BaseModel):
+    spc_monitor_name: str
+    metric: str
+    test: str
+    groups: List[SPCEntitySummary]
+    omnibus: SPCGroupTest
+    versus_fleet: List[SPCMeanOffset]
+    pairwise: List[SPCMeanOffset]
+
+
+class SPCHistogram(BaseModel):
+    edges: List[float]
+    counts: List[int]
+
+
+class SPCDistributionResponse(BaseModel):
+    spc_monitor_name: str
+    metric: str
+    n: int
+    min: Optional[float]
+    max: Optional[float]
+    percentiles: Dict[str, Optional[float]]
+    histogram: SPCHistogram
+    engine: str
+
+
+# Export schemas
+class ParquetSnapshot(BaseModel):
+    table: str
+    month: str
+    rows: int
+    latest: datetime
+    exported_at: Optional[datetime]
+    size_bytes: int
@@ -0,0 +1,21 @@
+"""Add the users.token_version column on existing databases."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from database import engine
+
+if __name__ == "__main__":
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "ALTER TABLE users "
+                "ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0"
+            )
+        )
+
+    print("✓ Added users.token_version")
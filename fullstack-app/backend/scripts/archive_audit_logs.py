@@ -0,0 +1,40 @@
+"""Add upcoming audit partitions and archive expired months (for cron)."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from audit_partitions import archive_expired, ensure_partitions
+from database import SessionLocal
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Apply the audit log retention policy")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="List the months that would be archived without changing anything",
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        created = [] if args.dry_run else ensure_partitions(db)
+        archived = archive_expired(db, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    for name in created:
+        print(f"✓ Created partition {name}")
+    for entry in archived:
+        if args.dry_run:
+            print(f"✓ Would archive {entry['month']}")
+        else:
+            print(
+                f"✓ Archived {entry['rows']} rows for {entry['month']} to {entry['path']}"
+            )
+    if not created and not archived:
+        print("✓ Nothing to do")
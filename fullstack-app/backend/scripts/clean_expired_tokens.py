@@ -0,0 +1,20 @@
+"""Delete expired refresh tokens and blacklist entries. Run on a schedule."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import SessionLocal
+from auth import clean_expired_tokens
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        removed = clean_expired_tokens(db)
+    finally:
+        db.close()
+
+    for table, count in removed.items():
+        print(f"✓ Removed {count} expired rows from {table}")
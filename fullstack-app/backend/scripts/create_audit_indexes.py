@@ -0,0 +1,17 @@
+"""Create the audit_logs paging, action and subnet indexes on existing databases."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import engine
+from models import AuditLog
+
+if __name__ == "__main__":
+    # On a partitioned table each index is created on every partition
+    for index in AuditLog.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+    print(f"✓ Created indexes for {AuditLog.__tablename__}")
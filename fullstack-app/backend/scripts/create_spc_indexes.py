@@ -0,0 +1,17 @@
+"""Create composite SPC indexes on existing databases."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import engine
+from models import SPCCdL1, SPCRegL1
+
+if __name__ == "__main__":
+    for model in (SPCCdL1, SPCRegL1):
+        for index in model.__table__.indexes:
+            index.create(engine, checkfirst=True)
+
+        print(f"✓ Created indexes for {model.__tablename__}")
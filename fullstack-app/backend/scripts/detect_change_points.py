@@ -0,0 +1,19 @@
+"""Run SPC change-point detection (for cron where background tasks are disabled)."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import SessionLocal
+from spc_change_points import detect_change_points
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        stored = detect_change_points(db)
+    finally:
+        db.close()
+
+    print(f"✓ Stored {stored} change points")
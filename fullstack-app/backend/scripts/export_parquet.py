@@ -0,0 +1,35 @@
+"""Export monthly Parquet snapshots of the SPC tables (requires pyarrow)."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import ReadSessionLocal
+from parquet_export import EXPORT_TABLES, export_tables
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export Parquet snapshots")
+    parser.add_argument(
+        "tables",
+        nargs="*",
+        choices=list(EXPORT_TABLES),
+        help="Tables to export (default: all)",
+    )
+    args = parser.parse_args()
+
+    # Read from the replica when one is configured to spare the primary
+    db = ReadSessionLocal()
+    try:
+        summary = export_tables(db, args.tables or None)
+    finally:
+        db.close()
+
+    for table, result in summary.items():
+        print(
+            f"✓ {table}: {len(result['written'])} months written, "
+            f"{result['unchanged']} unchanged, {len(result['removed'])} removed"
+        )
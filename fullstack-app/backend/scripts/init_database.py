@@ -3,12 +3,14 @@
 Initialize database with tables and superuser.
 Can be run locally or via Lambda invocation.
 """
+
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database import engine, Base, SessionLocal
+from audit_partitions import ensure_partitions
 from models import User
 from auth import get_password_hash
 import logging
@@ -28,6 +30,10 @@ def init_database():
         # Create superuser
         db = SessionLocal()
         try:
+            created = ensure_partitions(db)
+            if created:
+                logger.info(f"Audit partitions created: {', '.join(created)}")
+
             # Check if superuser already exists
             email = os.getenv("SUPERUSER_EMAIL", "admin@ccdh.me")
             existing_user = db.query(User).filter(User.email == email).first()
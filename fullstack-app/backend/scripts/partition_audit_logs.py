@@ -0,0 +1,71 @@
+"""
+Convert an existing audit_logs table into monthly partitions (PostgreSQL).
+
+The old table is renamed, the partitioned table is created from the model,
+partitions are added for every month that has rows, and the rows are copied
+over in one transaction. Writes to audit_logs block until it commits.
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from audit_partitions import TABLE, ensure_partitions, is_partitioned
+from database import engine
+from models import AuditLog
+
+LEGACY_TABLE = f"{TABLE}_unpartitioned"
+
+if __name__ == "__main__":
+    db = Session(bind=engine)
+    try:
+        if is_partitioned(db):
+            print(f"✓ {TABLE} is already partitioned")
+            sys.exit(0)
+
+        db.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+        oldest = db.execute(text(f"SELECT min(created_at) FROM {TABLE}")).scalar()
+
+        # Free the index and sequence names for the new table
+        indexes = db.execute(
+            text("SELECT indexname FROM pg_indexes WHERE tablename = :table"),
+            {"table": TABLE},
+        ).scalars()
+        for index in list(indexes):
+            db.execute(text(f"ALTER INDEX {index} RENAME TO {index}_old"))
+        db.execute(text(f"ALTER SEQUENCE {TABLE}_id_seq RENAME TO {TABLE}_id_seq_old"))
+        db.execute(text(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}"))
+
+        AuditLog.__table__.create(db.connection())
+        created = ensure_partitions(db, since=oldest, commit=False)
+
+        names = [column.name for column in AuditLog.__table__.columns]
+        values = [
+            "coalesce(created_at, now())" if name == "created_at" else name
+            for name in names
+        ]
+        copied = db.execute(
+            text(
+                f"INSERT INTO {TABLE} ({', '.join(names)}) "
+                f"SELECT {', '.join(values)} FROM {LEGACY_TABLE}"
+            )
+        ).rowcount
+        db.execute(
+            text(
+                f"SELECT setval('{TABLE}_id_seq', "
+                f"(SELECT coalesce(max(id), 0) + 1 FROM {TABLE}), false)"
+            )
+        )
+        db.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print(f"✓ Created {len(created)} partitions and copied {copied} audit rows")
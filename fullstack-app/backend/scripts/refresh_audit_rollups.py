@@ -0,0 +1,29 @@
+"""Refresh the hourly audit rollups (for cron where background tasks are disabled)."""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import SessionLocal
+from audit_rollups import refresh_rollups
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh hourly audit rollups")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rebuild all rollups instead of extending from the last hour",
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        written = refresh_rollups(db, full=args.full)
+    finally:
+        db.close()
+
+    print(f"✓ audit_log_rollup: {written} rollup rows written")
@@ -19,8 +19,9 @@ def reset_superuser_password():
         print("Superuser not found!")
         return
 
-    # Update password
+    # Update password and revoke tokens issued with the old one
     superuser.hashed_password = get_password_hash("admin123")
+    superuser.token_version += 1
     db.commit()
 
     print(f"Password reset for {superuser.email}")
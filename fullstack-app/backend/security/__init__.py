@@ -1,5 +1,5 @@
 """Security module for monitoring and alerting."""
 
-from .monitoring import SecurityMonitor, SecurityScanner
+from .monitoring import SecurityMonitor, SecurityScanner, security_detector
 
-__all__ = ["SecurityMonitor", "SecurityScanner"]
+__all__ = ["SecurityMonitor", "SecurityScanner", "security_detector"]
@@ -0,0 +1,318 @@
+"""
+Streaming sliding-window detection of security events.
+
+Every audit event is fed to the detector as it is logged. Per-user and per-IP
+counters over the alert windows are kept in rings of time buckets, so adding
+an event and reading a count cost a fixed number of bucket updates and never
+touch the database. Alerts are raised the moment an event pushes a counter
+to its threshold.
+
+Counts are per worker: events logged by other workers are not seen. At
+startup the detector is warmed from the last hour of audit_logs; until then
+(and on Lambda, where it is never warmed) checks fall back to queries.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from audit_actions import LOGIN_ACTIONS, REGISTRATION_ACTIONS
+
+logger = logging.getLogger(__name__)
+
+# Time buckets per window; counts are exact to within one bucket
+BUCKETS = 20
+# Keys tracked per counter; the least recently seen are evicted beyond this
+MAX_KEYS = 50_000
+
+# Suspicious pattern rules over the last hour
+PATTERN_WINDOW_SECONDS = 3600
+MULTIPLE_IPS_THRESHOLD = 3
+RAPID_ACTIONS_THRESHOLD = 50
+
+RECENT_ALERTS = 200
+
+
+class SlidingWindowCounter:
+    """Per-key event counts over a sliding window, kept in rings of buckets."""
+
+    def __init__(self, window_seconds: float, max_keys: int = MAX_KEYS):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = window_seconds / BUCKETS
+        self.max_keys = max_keys
+        # key -> [last bucket seen, bucket numbers, counts]
+        self._rings: OrderedDict = OrderedDict()
+
+    def _count(self, ring, current: int) -> int:
+        _, stamps, counts = ring
+        return sum(
+            count
+            for stamp, count in zip(stamps, counts)
+            if current - BUCKETS < stamp <= current
+        )
+
+    def add(self, key: Hashable, when: float) -> Tuple[int, int]:
+        """Count an event. Returns the key's count before and after it."""
+        bucket = int(when // self.bucket_seconds)
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = [bucket, [0] * BUCKETS, [0] * BUCKETS]
+        current = max(ring[0], bucket)
+        before = self._count(ring, current)
+        if current - BUCKETS < bucket:
+            slot = bucket % BUCKETS
+            if ring[1][slot] != bucket:
+                ring[1][slot], ring[2][slot] = bucket, 0
+            ring[2][slot] += 1
+        ring[0] = current
+        self._rings.move_to_end(key)
+        self._evict(current)
+        return before, self._count(ring, current)
+
+    def count(self, key: Hashable, now: float) -> int:
+        ring = self._rings.get(key)
+        if ring is None:
+            return 0
+        return self._count(ring, int(now // self.bucket_seconds))
+
+    def _evict(self, current: int):
+        # Rings are ordered by last update, so idle ones are at the front
+        while self._rings:
+            key, ring = next(iter(self._rings.items()))
+            if len(self._rings) <= self.max_keys and ring[0] > current - BUCKETS:
+                break
+            del self._rings[key]
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+
+class DistinctWindow:
+    """Distinct values seen per key over a sliding window."""
+
+    def __init__(self, window_seconds: float, max_values: int = 64):
+        self.window_seconds = window_seconds
+        self.max_values = max_values
+        # key -> OrderedDict of value -> last seen
+        self._values: Dict[Hashable, OrderedDict] = {}
+
+    def add(self, key: Hashable, value: Hashable, when: float) -> int:
+        seen = self._values.setdefault(key, OrderedDict())
+        seen[value] = max(seen.get(value, when), when)
+        seen.move_to_end(value)
+        while len(seen) > self.max_values:
+            seen.popitem(last=False)
+        return self.count(key, when)
+
+    def count(self, key: Hashable, now: float) -> int:
+        seen = self._values.get(key)
+        if not seen:
+            return 0
+        while seen and next(iter(seen.values())) <= now - self.window_seconds:
+            seen.popitem(last=False)
+        if not seen:
+            del self._values[key]
+            return 0
+        return len(seen)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class SecurityDetector:
+    """Sliding-window counters behind the SecurityMonitor alert checks."""
+
+    def __init__(self, thresholds: Dict[str, Dict[str, Any]]):
+        self.thresholds = thresholds
+        self.ready = False
+        self._lock = threading.Lock()
+        self._counters = {
+            rule: SlidingWindowCounter(config["window_minutes"] * 60)
+            for rule, config in thresholds.items()
+        }
+        self._ips_per_user = DistinctWindow(PATTERN_WINDOW_SECONDS)
+        self._actions = SlidingWindowCounter(PATTERN_WINDOW_SECONDS)
+        # Keys that crossed a pattern rule; rechecked when patterns are read
+        self._flagged: Dict[str, OrderedDict] = {
+            "multiple_ips": OrderedDict(),
+            "rapid_actions": OrderedDict(),
+        }
+        self._alerts: deque = deque(maxlen=RECENT_ALERTS)
+        self._stats = {"events": 0, "alerts": 0}
+
+    def _rules(self, row: Dict[str, Any]) -> List[str]:
+        action, success = row["action"], row["success"]
+        rules = []
+        if action in LOGIN_ACTIONS and not success:
+            rules.append("failed_logins")
+        if action in REGISTRATION_ACTIONS:
+            rules.append("registration_attempts")
+        if (
+            row.get("user_id") is not None
+            and not success
+            and (row.get("details") or {}).get("error") is not None
+        ):
+            rules.append("unauthorized_access")
+        return rules
+
+    def observe(self, row: Dict[str, Any]):
+        """Count one audit event (the row dict passed to create_audit_log)."""
+        created_at = row.get("created_at") or datetime.now(timezone.utc)
+        when = created_at.timestamp()
+        user_id = row.get("user_id")
+        ip = str(row["ip_address"]) if row.get("ip_address") else None
+
+        with self._lock:
+            self._stats["events"] += 1
+            for rule in self._rules(row):
+                config = self.thresholds[rule]
+                counter = self._counters[rule]
+                counts = {("all",): counter.add(("all",), when)}
+                if user_id is not None:
+                    counts["user"] = counter.add(("user", user_id), when)
+                if ip is not None:
+                    counts["ip"] = counter.add(("ip", ip), when)
+                if user_id is not None and ip is not None:
+                    counter.add(("pair", user_id, ip), when)
+
+                # Per-user rules fall back to the IP for anonymous events
+                scope = "user" if config.get("per_user") and "user" in counts else "ip"
+                if scope not in counts:
+                    continue
+                before, after = counts[scope]
+                if before < config["count"] <= after:
+                    self._raise(
+                        {
+                            "alert_type": rule,
+                            "count": after,
+                            "threshold": config["count"],
+                            "triggered": True,
+                            "user_id": user_id,
+                            "ip_address": ip,
+                            "window_minutes": config["window_minutes"],
+                        },
+                        created_at,
+                    )
+
+            if user_id is not None and ip is not None:
+                ips = self._ips_per_user.add(user_id, ip, when)
+                if ips > MULTIPLE_IPS_THRESHOLD:
+                    self._flag("multiple_ips", user_id, when)
+            _, actions = self._actions.add((user_id, ip), when)
+            if actions > RAPID_ACTIONS_THRESHOLD:
+                self._flag("rapid_actions", (user_id, ip), when)
+
+    def _flag(self, pattern: str, key: Hashable, when: float):
+        flagged = self._flagged[pattern]
+        flagged[key] = when
+        flagged.move_to_end(key)
+        while len(flagged) > MAX_KEYS:
+            flagged.popitem(last=False)
+
+    def _raise(self, alert: Dict[str, Any], created_at: datetime):
+        alert["timestamp"] = created_at.isoformat()
+        self._alerts.append(alert)
+        self._stats["alerts"] += 1
+        logger.warning(f"SECURITY ALERT: {alert}")
+
+    def count(
+        self, rule: str, user_id: Optional[int] = None, ip: Optional[str] = None
+    ) -> int:
+        """Events matching a rule within its window, optionally per user/IP."""
+        if user_id is not None and ip is not None:
+            key = ("pair", user_id, ip)
+        elif user_id is not None:
+            key = ("user", user_id)
+        elif ip is not None:
+            key = ("ip", ip)
+        else:
+            key = ("all",)
+        with self._lock:
+            return self._counters[rule].count(key, time.time())
+
+    def suspicious_patterns(self) -> List[Dict[str, Any]]:
+        """Users on many IPs and user/IP pairs with many actions in the last hour."""
+        now = time.time()
+        alerts = []
+        with self._lock:
+            flagged = self._flagged["multiple_ips"]
+            for user_id in list(flagged):
+                ip_count = self._ips_per_user.count(user_id, now)
+                if ip_count <= MULTIPLE_IPS_THRESHOLD:
+                    del flagged[user_id]
+                    continue
+                alerts.append(
+                    {
+                        "alert_type": "multiple_ips",
+                        "user_id": user_id,
+                        "ip_count": ip_count,
+                        "severity": "medium" if ip_count < 5 else "high",
+                    }
+                )
+
+            flagged = self._flagged["rapid_actions"]
+            for key in list(flagged):
+                action_count = self._actions.count(key, now)
+                if action_count <= RAPID_ACTIONS_THRESHOLD:
+                    del flagged[key]
+                    continue
+                alerts.append(
+                    {
+                        "alert_type": "rapid_actions",
+                        "user_id": key[0],
+                        "ip_address": key[1],
+                        "action_count": action_count,
+                        "severity": "high",
+                    }
+                )
+        return alerts
+
+    def recent_alerts(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._alerts))
+
+    def warm(self, db: Session) -> int:
+        """Replay the longest window of audit_logs, then serve checks from memory."""
+        from models import AuditLog
+
+        longest = max(
+            [config["window_minutes"] * 60 for config in self.thresholds.values()]
+            + [PATTERN_WINDOW_SECONDS]
+        )
+        since = datetime.now(timezone.utc) - timedelta(seconds=longest)
+        rows = (
+            db.query(
+                AuditLog.user_id,
+                AuditLog.action,
+                AuditLog.success,
+                AuditLog.ip_address,
+                AuditLog.details,
+                AuditLog.created_at,
+            )
+            .filter(AuditLog.created_at >= since)
+            .order_by(AuditLog.created_at)
+            .yield_per(10_000)
+        )
+        replayed = 0
+        for row in rows:
+            self.observe(dict(row._mapping))
+            replayed += 1
+        with self._lock:
+            # Replayed crossings are history, not new alerts
+            self._alerts.clear()
+            self._stats["alerts"] = 0
+        self.ready = True
+        return replayed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "ready": self.ready,
+                "keys": {rule: len(c) for rule, c in self._counters.items()},
+                "users_tracked": len(self._ips_per_user),
+                "pairs_tracked": len(self._actions),
+            }
@@ -10,49 +10,61 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 import logging
+from audit_actions import LOGIN_ACTIONS, REGISTRATION_ACTIONS
+from .detector import SecurityDetector
 
 logger = logging.getLogger(__name__)
 
+ALERT_THRESHOLDS = {
+    "failed_logins": {"count": 5, "window_minutes": 10, "per_user": True},
+    "registration_attempts": {
+        "count": 10,
+        "window_minutes": 60,
+        "per_ip": True,
+    },
+    "rate_limit_violations": {"count": 20, "window_minutes": 5, "per_ip": True},
+    "unauthorized_access": {"count": 3, "window_minutes": 15, "per_user": True},
+    "suspicious_activity": {"count": 10, "window_minutes": 30, "per_ip": True},
+}
+
+# Fed by create_audit_log; answers the alert checks once warmed at startup
+security_detector = SecurityDetector(ALERT_THRESHOLDS)
+
 
 class SecurityMonitor:
     """Monitor security events and trigger alerts."""
 
     def __init__(self, db: Session):
         self.db = db
-        self.alert_thresholds = {
-            "failed_logins": {"count": 5, "window_minutes": 10, "per_user": True},
-            "registration_attempts": {
-                "count": 10,
-                "window_minutes": 60,
-                "per_ip": True,
-            },
-            "rate_limit_violations": {"count": 20, "window_minutes": 5, "per_ip": True},
-            "unauthorized_access": {"count": 3, "window_minutes": 15, "per_user": True},
-            "suspicious_activity": {"count": 10, "window_minutes": 30, "per_ip": True},
-        }
+        self.alert_thresholds = ALERT_THRESHOLDS
 
     def check_failed_login_attempts(
         self, user_id: Optional[int] = None, ip_address: Optional[str] = None
     ) -> Dict:
         """Check for excessive failed login attempts."""
-        window_start = datetime.now(timezone.utc) - timedelta(
-            minutes=self.alert_thresholds["failed_logins"]["window_minutes"]
-        )
+        if security_detector.ready:
+            failed_attempts = security_detector.count(
+                "failed_logins", user_id or None, ip_address or None
+            )
+        else:
+            window_start = datetime.now(timezone.utc) - timedelta(
+                minutes=self.alert_thresholds["failed_logins"]["window_minutes"]
+            )
 
-        query = self.db.query(AuditLog).filter(
-            and_(
-                AuditLog.action == "login",
-                AuditLog.success.is_(False),
-                AuditLog.created_at >= window_start,
+            query = self.db.query(AuditLog).filter(
+                and_(
+                    AuditLog.action.in_(LOGIN_ACTIONS),
+                    AuditLog.success.is_(False),
+                    AuditLog.created_at >= window_start,
+                )
             )
-        )
 
-        if user_id:
-            query = query.filter(AuditLog.user_id == user_id)
-        if ip_address:
-            query = query.filter(AuditLog.ip_address == ip_address)
+            if user_id:
+                query = query.filter(AuditLog.user_id == user_id)
+            if ip_address:
+                query = query.filter(AuditLog.ip_address == ip_address)
 
-        failed_attempts = query.count()
+            failed_attempts = query.count()
         threshold = self.alert_thresholds["failed_logins"]["count"]
 
         return {
@@ -67,21 +79,24 @@ class SecurityMonitor:
 
     def check_registration_spam(self, ip_address: str) -> Dict:
         """Check for excessive registration attempts from an IP."""
-        window_start = datetime.now(timezone.utc) - timedelta(
-            minutes=self.alert_thresholds["registration_attempts"]["window_minutes"]
-        )
+        if security_detector.ready:
+            attempts = security_detector.count("registration_attempts", ip=ip_address)
+        else:
+            window_start = datetime.now(timezone.utc) - timedelta(
+                minutes=self.alert_thresholds["registration_attempts"]["window_minutes"]
+            )
 
-        attempts = (
-            self.db.query(AuditLog)
-            .filter(
-                and_(
-                    AuditLog.action == "register",
-                    AuditLog.ip_address == ip_address,
-                    AuditLog.created_at >= window_start,
+            attempts = (
+                self.db.query(AuditLog)
+                .filter(
+                    and_(
+                        AuditLog.action.in_(REGISTRATION_ACTIONS),
+                        AuditLog.ip_address == ip_address,
+                        AuditLog.created_at >= window_start,
+                    )
                 )
+                .count()
             )
-            .count()
-        )
 
         threshold = self.alert_thresholds["registration_attempts"]["count"]
 
@@ -98,22 +113,25 @@ class SecurityMonitor:
 
     def check_unauthorized_access(self, user_id: int) -> Dict:
         """Check for repeated unauthorized access attempts."""
-        window_start = datetime.now(timezone.utc) - timedelta(
-            minutes=self.alert_thresholds["unauthorized_access"]["window_minutes"]
-        )
+        if security_detector.ready:
+            attempts = security_detector.count("unauthorized_access", user_id)
+        else:
+            window_start = datetime.now(timezone.utc) - timedelta(
+                minutes=self.alert_thresholds["unauthorized_access"]["window_minutes"]
+            )
 
-        attempts = (
-            self.db.query(AuditLog)
-            .filter(
-                and_(
-                    AuditLog.user_id == user_id,
-                    AuditLog.success.is_(False),
-                    AuditLog.details.op("->>")("error").isnot(None),
-                    AuditLog.created_at >= window_start,
+            attempts = (
+                self.db.query(AuditLog)
+                .filter(
+                    and_(
+                        AuditLog.user_id == user_id,
+                        AuditLog.success.is_(False),
+                        AuditLog.details.op("->>")("error").isnot(None),
+                        AuditLog.created_at >= window_start,
+                    )
                 )
+                .count()
             )
-            .count()
-        )
 
         threshold = self.alert_thresholds["unauthorized_access"]["count"]
 
@@ -130,6 +148,9 @@ class SecurityMonitor:
 
     def get_suspicious_patterns(self) -> List[Dict]:
         """Detect suspicious activity patterns."""
+        if security_detector.ready:
+            return security_detector.suspicious_patterns()
+
         alerts = []
         window_start = datetime.now(timezone.utc) - timedelta(hours=1)
 
@@ -291,25 +312,27 @@ class SecurityScanner:
         """Check for inactive users that should be disabled."""
         cutoff_date = datetime.now(timezone.utc) - timedelta(days=30)
 
-        # Get last activity for each user
-        last_activities = (
-            self.db.query(
-                AuditLog.user_id, func.max(AuditLog.created_at).label("last_activity")
+        # Only activity since the cutoff matters, which keeps the scan to the
+        # recent audit partitions
+        recent_activity = (
+            self.db.query(AuditLog.id)
+            .filter(
+                and_(
+                    AuditLog.user_id == User.id,
+                    AuditLog.created_at >= cutoff_date,
+                )
             )
-            .filter(AuditLog.user_id.isnot(None))
-            .group_by(AuditLog.user_id)
-            .subquery()
+            .exists()
         )
 
         # Find users with no recent activity
         inactive_users = (
             self.db.query(User)
-            .outerjoin(last_activities, User.id == last_activities.c.user_id)
             .filter(
                 and_(
                     User.is_active.is_(True),
-                    func.coalesce(last_activities.c.last_activity, User.created_at)
-                    < cutoff_date,
+                    User.created_at < cutoff_date,
+                    ~recent_activity,
                 )
             )
             .all()
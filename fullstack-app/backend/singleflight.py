@@ -0,0 +1,39 @@
+"""
+Single-flight coalescing of identical concurrent queries.
+
+The first request for a key runs the query in the threadpool; requests for
+the same key that arrive while it is in flight await the same task and share
+its result instead of issuing a duplicate query.
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, Hashable
+from starlette.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._counters = {"executions": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self._counters["coalesced"] += 1
+        else:
+            self._counters["executions"] += 1
+            task = asyncio.ensure_future(run_in_threadpool(fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # Shield so a cancelled caller (client disconnect) does not cancel the
+        # query for everyone else waiting on it
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._counters, "in_flight": len(self._inflight)}
+
+
+query_flight = SingleFlight()
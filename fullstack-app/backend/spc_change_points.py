@@ -0,0 +1,159 @@
+"""
+Incremental change-point detection over SPC series.
+
+Each (table, metric, process, product, entity) series is segmented by shifts
+in its mean. Detected shifts are stored in spc_change_points. Per-series state
+records the last shift and the latest row seen, so each run only reprocesses
+series that received new rows, from their last shift onwards. A series with
+no shift yet is re-segmented over its whole history.
+
+Runs take a per-table advisory lock, so the background loop and
+scripts/detect_change_points.py never process the same series at once.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from analytics import binary_segmentation
+from config import settings
+from database import SessionLocal, advisory_xact_lock
+import models
+
+logger = logging.getLogger(__name__)
+
+# Metrics scanned for shifts, per SPC table
+CHANGE_POINT_METRICS = {
+    models.SPCCdL1: ("bias", "bias_x_y"),
+    models.SPCRegL1: ("scale_x", "scale_y"),
+}
+
+PENALTY_FACTOR = 3.0
+MIN_SEGMENT_SIZE = 5
+
+
+def _load_states(db: Session, table: str) -> Dict[Tuple, models.SPCChangePointState]:
+    states = db.query(models.SPCChangePointState).filter(
+        models.SPCChangePointState.source_table == table
+    )
+    return {
+        (state.metric, state.process_type, state.product_type, state.entity): state
+        for state in states
+    }
+
+
+def detect_change_points(db: Session) -> int:
+    """Run detection on every series with new rows. Returns shifts stored."""
+    stored = 0
+
+    for model, metrics in CHANGE_POINT_METRICS.items():
+        table = model.__tablename__
+        advisory_xact_lock(db, f"change_points:{table}")
+        states = _load_states(db, table)
+        series = (
+            db.query(
+                model.process_type,
+                model.product_type,
+                model.entity,
+                func.max(model.date_process),
+            )
+            .group_by(model.process_type, model.product_type, model.entity)
+            .all()
+        )
+
+        for process_type, product_type, entity, latest in series:
+            pending = {
+                metric: states.get((metric, process_type, product_type, entity))
+                for metric in metrics
+            }
+            pending = {
+                metric: state
+                for metric, state in pending.items()
+                if state is None or state.processed_through < latest
+            }
+            if not pending:
+                continue
+
+            # Load the series once, from the earliest open segment
+            starts = [
+                state.segment_start if state else None for state in pending.values()
+            ]
+            query = db.query(
+                model.date_process,
+                model.lot,
+                *[getattr(model, metric) for metric in pending],
+            ).filter(
+                model.process_type == process_type,
+                model.product_type == product_type,
+                model.entity == entity,
+            )
+            if all(start is not None for start in starts):
+                query = query.filter(model.date_process >= min(starts))
+            rows = query.order_by(model.date_process, model.lot).all()
+            if not rows:
+                continue
+
+            dates = np.array([row[0] for row in rows], dtype="datetime64[us]")
+            lots = [row[1] for row in rows]
+
+            for column, (metric, state) in enumerate(pending.items(), start=2):
+                offset = 0
+                if state is not None and state.segment_start is not None:
+                    offset = int(
+                        np.searchsorted(dates, np.datetime64(state.segment_start, "us"))
+                    )
+                values = np.array([row[column] for row in rows[offset:]], dtype=float)
+
+                indices = binary_segmentation(values, PENALTY_FACTOR, MIN_SEGMENT_SIZE)
+                bounds = [0] + indices + [len(values)]
+                for i, index in enumerate(indices):
+                    db.add(
+                        models.SPCChangePoint(
+                            source_table=table,
+                            metric=metric,
+                            process_type=process_type,
+                            product_type=product_type,
+                            entity=entity,
+                            date_process=rows[offset + index][0],
+                            lot=lots[offset + index],
+                            mean_before=float(values[bounds[i] : index].mean()),
+                            mean_after=float(values[index : bounds[i + 2]].mean()),
+                        )
+                    )
+                stored += len(indices)
+
+                if state is None:
+                    state = models.SPCChangePointState(
+                        source_table=table,
+                        metric=metric,
+                        process_type=process_type,
+                        product_type=product_type,
+                        entity=entity,
+                    )
+                    db.add(state)
+                if indices:
+                    state.segment_start = rows[offset + indices[-1]][0]
+                state.processed_through = latest
+
+        db.commit()
+
+    return stored
+
+
+async def run_forever():
+    """Background loop running change-point detection on a fixed interval."""
+    while True:
+        db = SessionLocal()
+        try:
+            stored = await run_in_threadpool(detect_change_points, db)
+            if stored:
+                logger.info(f"Stored {stored} SPC change points")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"SPC change-point detection failed: {e}")
+        finally:
+            db.close()
+        await asyncio.sleep(settings.change_point_interval_seconds)
@@ -0,0 +1,362 @@
+"""
+Shared query helpers for the SPC monitor tables.
+"""
+
+from datetime import datetime, date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import Float, Integer, and_, func
+import numpy as np
+from config import settings
+import models
+
+# Map spc_monitor_name to the table holding its data
+SPC_MODELS = {
+    "SPC_CD_L1": models.SPCCdL1,
+    "SPC_REG_L1": models.SPCRegL1,
+}
+
+# String columns whose values are ordinal categories (e.g. FP1_A < FP1_B < ...)
+ORDINAL_COLUMNS = ("fake_property1", "fake_property2")
+
+GUEST_WINDOW_DAYS = 30
+
+# Response headers carrying the total row count of a paged list response
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_EXACT_HEADER = "X-Total-Count-Exact"
+
+
+def get_spc_model(spc_monitor_name: str):
+    """Return the model for an SPC monitor or raise a 404."""
+    model = SPC_MODELS.get(spc_monitor_name)
+    if model is None:
+        raise HTTPException(
+            status_code=404, detail=f"Unknown SPC monitor: {spc_monitor_name}"
+        )
+    return model
+
+
+def get_metric_columns(model) -> List[str]:
+    """Names of the numeric measurement columns of an SPC model."""
+    return [
+        column.name
+        for column in model.__table__.columns
+        if isinstance(column.type, (Float, Integer))
+    ]
+
+
+def clamp_guest_date_range(
+    start_date: Optional[date], end_date: Optional[date], current_user
+) -> Tuple[Optional[date], Optional[date]]:
+    """Clamp the date range to the guest window for unauthenticated users."""
+    if current_user:
+        return start_date, end_date
+
+    today = date.today()
+    window_start = today - timedelta(days=GUEST_WINDOW_DAYS)
+
+    # Override dates for guests
+    if not start_date or start_date < window_start:
+        start_date = window_start
+    if not end_date or end_date > today:
+        end_date = today
+
+    # Validate guest date range
+    if start_date < window_start or end_date > today:
+        raise HTTPException(
+            status_code=403,
+            detail="Guest access is limited to the past 30 days of data",
+        )
+
+    return start_date, end_date
+
+
+# A filter value: a single string, or a list of strings matched with IN
+FilterValue = Optional[Union[str, Sequence[str]]]
+
+
+def filter_values(value: FilterValue) -> List[str]:
+    """Normalize a filter value to a de-duplicated list of non-empty strings."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(dict.fromkeys(v for v in value if v))
+
+
+def _match(column, value: FilterValue):
+    values = filter_values(value)
+    if not values:
+        return None
+    return column == values[0] if len(values) == 1 else column.in_(values)
+
+
+def build_spc_filters(
+    model,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    entity: FilterValue = None,
+    process_type: FilterValue = None,
+    product_type: FilterValue = None,
+    spc_monitor_name: Optional[str] = None,
+    date_column=None,
+) -> List:
+    """
+    Build the standard SPC filter list for a model. List-valued filters
+    compile to IN predicates. Dates apply to date_process unless another
+    date_column is given.
+    """
+    if date_column is None:
+        date_column = model.date_process
+
+    filters = []
+    if start_date:
+        filters.append(date_column >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        filters.append(date_column <= datetime.combine(end_date, datetime.max.time()))
+    for name, value in (
+        ("entity", entity),
+        ("process_type", process_type),
+        ("product_type", product_type),
+        ("spc_monitor_name", spc_monitor_name),
+    ):
+        # Only touch columns that are filtered on; not every model has them all
+        if filter_values(value):
+            filters.append(_match(getattr(model, name), value))
+    return filters
+
+
+def matches_filter(value: str, allowed: FilterValue) -> bool:
+    """Python-side equivalent of a list-valued filter, for in-memory rows."""
+    values = filter_values(allowed)
+    return not values or value in values
+
+
+def get_sortable_columns(model) -> List[str]:
+    """
+    Columns a list endpoint may sort by: the primary key and indexed
+    columns, so ORDER BY ... LIMIT can be served from an index.
+    """
+    return [
+        column.name
+        for column in model.__table__.columns
+        if column.primary_key or column.index
+    ]
+
+
+def build_order_by(model, sort_by: Optional[str], sort_order: str) -> List:
+    """
+    ORDER BY clause for a whitelisted sort column. Ties are broken by newest
+    date_process and then lot so that offset paging is stable.
+    """
+    sort_by = sort_by or "date_process"
+    if sort_by not in get_sortable_columns(model):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot sort by {sort_by}. "
+            f"Allowed: {', '.join(get_sortable_columns(model))}",
+        )
+
+    direction = "asc" if sort_order == "asc" else "desc"
+    order_by = [getattr(getattr(model, sort_by), direction)()]
+    if sort_by != "date_process":
+        order_by.append(model.date_process.desc())
+    if sort_by != "lot":
+        order_by.append(getattr(model.lot, direction)())
+    return order_by
+
+
+def sort_rows(
+    rows: List[Dict[str, Any]], sort_by: Optional[str], sort_order: str
+) -> List[Dict[str, Any]]:
+    """Sort serialized rows in the same order as build_order_by."""
+    sort_by = sort_by or "date_process"
+    descending = sort_order != "asc"
+
+    def key(column):
+        # NULLs sort last ascending and first descending, as in PostgreSQL
+        return lambda row: (row[column] is None, row[column])
+
+    # Stable sorts from the last tiebreak to the primary column
+    keys = []
+    if sort_by != "lot":
+        keys.append(("lot", descending))
+    if sort_by != "date_process":
+        keys.append(("date_process", True))
+    keys.append((sort_by, descending))
+    for column, reverse in keys:
+        rows = sorted(rows, key=key(column), reverse=reverse)
+    return rows
+
+
+def stats_columns(model, spec: List[Tuple[str, str, str, int]]) -> List:
+    """
+    SQL aggregate expressions for a stats spec of (label, function, column,
+    decimals) tuples, preceded by the total row count.
+    """
+    return [func.count(model.lot).label("total_count")] + [
+        getattr(func, function)(getattr(model, column)).label(label)
+        for label, function, column, _ in spec
+    ]
+
+
+def format_stats(
+    values: Dict[str, Any], spec: List[Tuple[str, str, str, int]]
+) -> Dict[str, Any]:
+    """Round aggregate values per the stats spec, mapping missing values to 0."""
+    result = {"total_count": values.get("total_count") or 0}
+    for label, _, _, decimals in spec:
+        value = values.get(label)
+        result[label] = round(value, decimals) if value is not None else 0
+    return result
+
+
+def validate_columns(model, requested: List[str], allowed: List[str]) -> List[str]:
+    """Validate requested column names against an allowed list, keeping order."""
+    invalid = [name for name in requested if name not in allowed]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid columns for {model.__tablename__}: {', '.join(invalid)}. "
+            f"Allowed: {', '.join(allowed)}",
+        )
+    # Drop duplicates while preserving order
+    return list(dict.fromkeys(requested))
+
+
+def load_metric_arrays(
+    db, model, metrics: List[str], filters: List
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load entity labels and metric columns in a single query.
+
+    Returns (entities, values) where values is a float array of shape
+    (n_rows, len(metrics)). Ordinal string columns are dictionary-encoded
+    by their sorted category order.
+    """
+    columns = [model.entity] + [getattr(model, name) for name in metrics]
+    query = db.query(*columns)
+    if filters:
+        query = query.filter(and_(*filters))
+    rows = query.all()
+
+    if not rows:
+        return np.empty(0, dtype=object), np.empty((0, len(metrics)))
+
+    transposed = list(zip(*rows))
+    return metric_matrix(transposed[0], transposed[1:], metrics)
+
+
+def metric_matrix(
+    entities: Sequence, columns: Sequence[Sequence], metrics: List[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stack metric columns into a float matrix next to the entity labels,
+    dictionary-encoding ordinal columns.
+    """
+    entities = np.asarray(entities, dtype=object)
+    values = np.empty((len(entities), len(metrics)))
+    for i, (name, column) in enumerate(zip(metrics, columns)):
+        if name in ORDINAL_COLUMNS:
+            values[:, i] = np.unique(np.asarray(column), return_inverse=True)[1]
+        else:
+            values[:, i] = np.asarray(column, dtype=float)
+    return entities, values
+
+
+def estimate_row_count(db, query) -> Optional[int]:
+    """Planner row estimate for a query, or None if it cannot be obtained."""
+    if db.bind.dialect.name != "postgresql":
+        return None
+
+    compiled = query.statement.compile(
+        dialect=db.bind.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    plan = (
+        db.connection()
+        .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+        .scalar()
+    )
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_total(
+    db,
+    model,
+    filters: List,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    skip: int,
+    limit: int,
+    page_length: int,
+) -> Tuple[int, bool]:
+    """
+    Total rows matching the filters of a paged list, and whether it is exact.
+
+    Never runs an unbounded COUNT(*): a partial last page gives the total for
+    free, short date ranges are counted exactly over the date_process index,
+    and anything else uses the planner's row estimate.
+    """
+    if page_length < limit and (page_length > 0 or skip == 0):
+        return skip + page_length, True
+
+    query = db.query(model)
+    if filters:
+        query = query.filter(and_(*filters))
+
+    bounded = (
+        start_date is not None
+        and end_date is not None
+        and (end_date - start_date).days <= settings.exact_count_max_days
+    )
+    estimate = None if bounded else estimate_row_count(db, query)
+    if estimate is None:
+        return query.order_by(None).count(), True
+
+    # The estimate can never be below the rows we have already seen
+    return max(estimate, skip + page_length), False
+
+
+def set_total_headers(response, total: int, exact: bool):
+    """Attach total-count metadata to a paged list response."""
+    response.headers[TOTAL_COUNT_HEADER] = str(total)
+    response.headers[TOTAL_EXACT_HEADER] = "true" if exact else "false"
+
+
+def parse_fields(model, fields: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    Validate a fields= projection against the model's columns. Accepts both
+    repeated parameters and comma-separated values.
+    """
+    if not fields:
+        return None
+    requested = [name.strip() for value in fields for name in value.split(",")]
+    requested = [name for name in requested if name]
+    if not requested:
+        return None
+    return validate_columns(
+        model, requested, [column.name for column in model.__table__.columns]
+    )
+
+
+def project_rows(rows: List[Dict[str, Any]], fields: List[str]) -> List[Dict]:
+    """Keep only the projected keys of serialized rows."""
+    return [{name: row[name] for name in fields} for row in rows]
+
+
+def paged_response(
+    response, items: List[Dict], total: int, exact: bool, fields: Optional[List[str]]
+):
+    """
+    Return a page of list results with total-count headers. Projected pages
+    bypass the full response model, which would reject the missing keys.
+    """
+    if fields:
+        response = JSONResponse(content=jsonable_encoder(items))
+        set_total_headers(response, total, exact)
+        return response
+
+    set_total_headers(response, total, exact)
+    return items
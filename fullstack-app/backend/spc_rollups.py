@@ -0,0 +1,330 @@
+"""
+Hourly rollups of SPC metrics for zoomed-out charts.
+
+spc_rollup_hourly holds the count, sum, sum of squares, min and max of every
+metric per hour, process/product combination and entity. A background job
+extends it from the last rolled-up hour, and bucket queries merge rollup rows
+with the raw rows from that hour onwards. Back-dated rows inserted into (or
+deleted from) already rolled-up hours are picked up by the next refresh, which
+recomputes every hour whose raw row count no longer matches its rollup; until
+then, and for updates that keep an hour's row count, those hours are stale.
+"""
+
+import asyncio
+import logging
+import math
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import DateTime, and_, func, insert, literal, or_, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import SessionLocal, advisory_xact_lock
+from duckdb_mirror import duckdb_mirror
+from spc_query import SPC_MODELS, FilterValue, build_spc_filters, get_metric_columns
+import models
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ("hour", "shift", "day", "week")
+
+# Shifts are 8-hour blocks starting at 06:00, 14:00 and 22:00
+SHIFT_HOURS = 8
+SHIFT_START_HOUR = 6
+
+ROLLUP_COLUMNS = [
+    "source_table",
+    "metric",
+    "bucket_start",
+    "process_type",
+    "product_type",
+    "spc_monitor_name",
+    "entity",
+    "n",
+    "total",
+    "total_sq",
+    "min_value",
+    "max_value",
+]
+
+
+def _date_trunc(unit: str, column):
+    return func.date_trunc(unit, column, type_=DateTime)
+
+
+def _shift_start(value: datetime) -> datetime:
+    shifted = value - timedelta(hours=SHIFT_START_HOUR)
+    start = shifted.replace(
+        hour=shifted.hour - shifted.hour % SHIFT_HOURS,
+        minute=0,
+        second=0,
+        microsecond=0,
+    )
+    return start + timedelta(hours=SHIFT_START_HOUR)
+
+
+def get_rollup_cutoff(db: Session, model) -> Optional[datetime]:
+    """
+    Start of the newest rolled-up hour of a table. Rollup rows before it are
+    complete; rows from it onwards are read from the base table.
+    """
+    rollup = models.SPCRollupHourly
+    return (
+        db.query(func.max(rollup.bucket_start))
+        .filter(rollup.source_table == model.__tablename__)
+        .scalar()
+    )
+
+
+def _changed_hours(db: Session, model, before: datetime) -> List[datetime]:
+    """
+    Rolled-up hours before a cutoff whose raw row count differs from the
+    rollup's, i.e. that gained or lost rows after they were rolled up. Metric
+    columns are non-null, so any one metric's n is the hour's row count.
+    """
+    rollup = models.SPCRollupHourly
+    table = model.__tablename__
+    hour = _date_trunc("hour", model.date_process)
+    raw = dict(
+        db.query(hour, func.count())
+        .filter(model.date_process < before)
+        .group_by(hour)
+        .all()
+    )
+    rolled = dict(
+        db.query(rollup.bucket_start, func.sum(rollup.n))
+        .filter(
+            rollup.source_table == table,
+            rollup.metric == get_metric_columns(model)[0],
+            rollup.bucket_start < before,
+        )
+        .group_by(rollup.bucket_start)
+        .all()
+    )
+    return sorted(
+        start
+        for start in raw.keys() | rolled.keys()
+        if raw.get(start, 0) != rolled.get(start, 0)
+    )
+
+
+def refresh_rollups(db: Session, full: bool = False) -> Dict[str, int]:
+    """
+    Recompute rollup rows from the newest rolled-up hour onwards, which may
+    have been partial, plus earlier hours that gained or lost rows since they
+    were rolled up, or rebuild them entirely. Returns rows written per
+    table. Concurrent refreshes of a table wait for each other, so they never
+    both insert the rows of the same hours.
+    """
+    rollup = models.SPCRollupHourly
+    written = {}
+
+    for model in SPC_MODELS.values():
+        table = model.__tablename__
+        advisory_xact_lock(db, f"{rollup.__tablename__}:{table}")
+        since = None if full else get_rollup_cutoff(db, model)
+        changed = [] if since is None else _changed_hours(db, model, since)
+        if changed:
+            logger.info(f"Re-rolling {len(changed)} back-filled hours of {table}")
+
+        stale = db.query(rollup).filter(rollup.source_table == table)
+        if since is not None:
+            stale = stale.filter(
+                or_(rollup.bucket_start >= since, rollup.bucket_start.in_(changed))
+            )
+        stale.delete(synchronize_session=False)
+
+        hour = _date_trunc("hour", model.date_process)
+        written[table] = 0
+        for metric in get_metric_columns(model):
+            column = getattr(model, metric)
+            query = select(
+                literal(table),
+                literal(metric),
+                hour,
+                model.process_type,
+                model.product_type,
+                model.spc_monitor_name,
+                model.entity,
+                func.count(column),
+                func.sum(column),
+                func.sum(column * column),
+                func.min(column),
+                func.max(column),
+            ).group_by(
+                hour,
+                model.process_type,
+                model.product_type,
+                model.spc_monitor_name,
+                model.entity,
+            )
+            if since is not None:
+                window = model.date_process >= since
+                if changed:
+                    # The lower bound lets the date_process index narrow the scan
+                    window = or_(
+                        window,
+                        and_(model.date_process >= changed[0], hour.in_(changed)),
+                    )
+                query = query.where(window)
+
+            result = db.execute(insert(rollup).from_select(ROLLUP_COLUMNS, query))
+            written[table] += result.rowcount
+
+        db.commit()
+
+    return written
+
+
+def query_buckets(
+    db: Session,
+    model,
+    metric: str,
+    bucket: str,
+    by_entity: bool = False,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    entity: FilterValue = None,
+    process_type: FilterValue = None,
+    product_type: FilterValue = None,
+) -> List[Dict[str, Any]]:
+    """
+    Count, mean, min, max and sample stddev of a metric per time bucket,
+    optionally split by entity, ordered by bucket start.
+    """
+    rollup = models.SPCRollupHourly
+    column = getattr(model, metric)
+    # Shifts do not align with date_trunc units, so they are built from hours
+    unit = "hour" if bucket == "shift" else bucket
+
+    # The columnar mirror aggregates raw rows fast enough to skip the rollups
+    if duckdb_mirror.available(model):
+        partials = duckdb_mirror.bucket_partials(
+            model,
+            metric,
+            unit,
+            by_entity,
+            start_date=start_date,
+            end_date=end_date,
+            entity=entity,
+            process_type=process_type,
+            product_type=product_type,
+        )
+        return combine_partials(partials, bucket, by_entity)
+
+    cutoff = get_rollup_cutoff(db, model)
+
+    partials = []
+
+    if cutoff is not None:
+        trunc = _date_trunc(unit, rollup.bucket_start)
+        group = [trunc, rollup.entity] if by_entity else [trunc]
+        filters = build_spc_filters(
+            rollup,
+            start_date,
+            end_date,
+            entity,
+            process_type,
+            product_type,
+            date_column=rollup.bucket_start,
+        ) + [
+            rollup.source_table == model.__tablename__,
+            rollup.metric == metric,
+            rollup.bucket_start < cutoff,
+        ]
+        partials += (
+            db.query(
+                *group,
+                func.sum(rollup.n),
+                func.sum(rollup.total),
+                func.sum(rollup.total_sq),
+                func.min(rollup.min_value),
+                func.max(rollup.max_value),
+            )
+            .filter(and_(*filters))
+            .group_by(*group)
+            .all()
+        )
+
+    trunc = _date_trunc(unit, model.date_process)
+    group = [trunc, model.entity] if by_entity else [trunc]
+    filters = build_spc_filters(
+        model, start_date, end_date, entity, process_type, product_type
+    )
+    if cutoff is not None:
+        filters.append(model.date_process >= cutoff)
+    query = db.query(
+        *group,
+        func.count(column),
+        func.sum(column),
+        func.sum(column * column),
+        func.min(column),
+        func.max(column),
+    )
+    if filters:
+        query = query.filter(and_(*filters))
+    partials += query.group_by(*group).all()
+
+    return combine_partials(partials, bucket, by_entity)
+
+
+def combine_partials(
+    partials: List[Tuple], bucket: str, by_entity: bool
+) -> List[Dict[str, Any]]:
+    """Merge (start, [entity,] n, sum, sum_sq, min, max) rows into buckets."""
+    merged: Dict[Tuple, List] = {}
+    for row in partials:
+        if by_entity:
+            start, entity_name, n, total, total_sq, low, high = row
+        else:
+            (start, n, total, total_sq, low, high), entity_name = row, None
+        if not n:
+            continue
+        if bucket == "shift":
+            start = _shift_start(start)
+
+        key = (start, entity_name)
+        acc = merged.get(key)
+        if acc is None:
+            merged[key] = [int(n), float(total), float(total_sq), low, high]
+        else:
+            acc[0] += int(n)
+            acc[1] += float(total)
+            acc[2] += float(total_sq)
+            acc[3] = min(acc[3], low)
+            acc[4] = max(acc[4], high)
+
+    buckets = []
+    for (start, entity_name), (n, total, total_sq, low, high) in sorted(
+        merged.items(), key=lambda item: (item[0][0], item[0][1] or "")
+    ):
+        stddev = None
+        if n > 1:
+            # Clamp rounding noise; matches Postgres stddev (sample)
+            stddev = math.sqrt(max(total_sq - total * total / n, 0.0) / (n - 1))
+        buckets.append(
+            {
+                "bucket_start": start,
+                "entity": entity_name,
+                "count": n,
+                "mean": total / n,
+                "min": float(low),
+                "max": float(high),
+                "stddev": stddev,
+            }
+        )
+    return buckets
+
+
+async def run_forever():
+    """Background loop extending the hourly rollups on a fixed interval."""
+    while True:
+        db = SessionLocal()
+        try:
+            await run_in_threadpool(refresh_rollups, db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"SPC rollup refresh failed: {e}")
+        finally:
+            db.close()
+        await asyncio.sleep(settings.spc_rollup_refresh_seconds)
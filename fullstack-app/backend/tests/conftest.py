@@ -0,0 +1,92 @@
+"""
+Fixtures running the API against an in-memory SQLite database.
+
+PostgreSQL-only column types are compiled to their SQLite equivalents, and
+audit_logs ids are assigned client-side because SQLite cannot autoincrement
+a composite primary key.
+"""
+
+import itertools
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import INET
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import models  # noqa: E402
+from database import get_db  # noqa: E402
+from password_hashing import password_hasher  # noqa: E402
+from principal_cache import principal_cache  # noqa: E402
+from token_versions import token_versions  # noqa: E402
+
+TABLES = [models.User, models.RefreshToken, models.AuditLog, models.BlacklistedToken]
+
+
+@compiles(INET, "sqlite")
+def _inet_sqlite(type_, compiler, **kw):
+    return "TEXT"
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    audit_id = models.AuditLog.__table__.c.id
+    autoincrement, audit_id.autoincrement = audit_id.autoincrement, False
+    ids = itertools.count(1)
+
+    def assign_audit_id(mapper, connection, target):
+        if target.id is None:
+            target.id = next(ids)
+
+    event.listen(models.AuditLog, "before_insert", assign_audit_id)
+    for model in TABLES:
+        model.__table__.create(engine)
+    yield engine
+    event.remove(models.AuditLog, "before_insert", assign_audit_id)
+    audit_id.autoincrement = autoincrement
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def app(session_factory, monkeypatch):
+    from routers import auth
+
+    # Hash in a thread instead of spawning worker processes
+    monkeypatch.setattr(password_hasher, "_executor", ThreadPoolExecutor(1))
+    principal_cache.clear()
+    monkeypatch.setattr(token_versions, "_versions", {})
+
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api/auth")
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+@pytest.fixture
+def client(app):
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,76 @@
+"""Statement counts of the login, refresh and logout flows."""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+import models
+from auth import get_password_hash
+
+EMAIL = "user@example.com"
+PASSWORD = "correct-horse-battery"
+
+
+@pytest.fixture
+def user(session_factory):
+    db = session_factory()
+    db.add(
+        models.User(
+            email=EMAIL,
+            username="user",
+            hashed_password=get_password_hash(PASSWORD),
+            is_active=True,
+        )
+    )
+    db.commit()
+    db.close()
+
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def login(client):
+    response = client.post(
+        "/api/auth/login", json={"email": EMAIL, "password": PASSWORD}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_login_statements(client, engine, user):
+    with count_statements(engine) as statements:
+        login(client)
+    assert len(statements) == 3, statements
+
+
+def test_refresh_statements(client, engine, user):
+    tokens = login(client)
+    with count_statements(engine) as statements:
+        response = client.post(
+            "/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+        )
+    assert response.status_code == 200, response.text
+    assert len(statements) == 3, statements
+
+
+def test_logout_statements(client, engine, user):
+    tokens = login(client)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    # Resolve the principal once, as any earlier request of the session would
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    with count_statements(engine) as statements:
+        response = client.post("/api/auth/logout", headers=headers)
+    assert response.status_code == 200, response.text
+    assert len(statements) == 3, statements
@@ -0,0 +1,95 @@
+"""
+Per-user token versions for revoking JWTs.
+
+Access and refresh tokens carry the user's token_version at issue time as
+"ver". Bumping the version revokes every token issued before, so a logout is
+one UPDATE instead of a blacklist row per token. Current versions are held in
+a small per-worker map, refreshed from the users table after a TTL, which
+makes the revocation check a dictionary lookup on most requests. Workers
+other than the one that bumped a version pick it up within the TTL.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from config import settings
+from models import User
+
+
+class TokenVersions:
+    """Map of user id -> (token_version, loaded_at) with a TTL."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._versions: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "bumps": 0}
+
+    def current(self, db: Session, user_id: int) -> Optional[int]:
+        """A user's token version, or None if the user no longer exists."""
+        with self._lock:
+            entry = self._versions.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+                self._counters["hits"] += 1
+                return entry[0]
+            self._counters["misses"] += 1
+
+        version = db.query(User.token_version).filter(User.id == user_id).scalar()
+        with self._lock:
+            if version is None:
+                self._versions.pop(user_id, None)
+            else:
+                self._versions[user_id] = (version, time.monotonic())
+        return version
+
+    def is_revoked(self, db: Session, payload: Dict[str, Any]) -> bool:
+        """Whether a token was issued before its user's current version."""
+        version = self.current(db, int(payload["sub"]))
+        return version is None or payload["ver"] < version
+
+    def bump(self, db: Session, user_id: int, commit: bool = True) -> Optional[int]:
+        """
+        Revoke all of a user's tokens. Returns the new version. With
+        commit=False the map is only updated once the caller's transaction
+        commits, so a rollback never leaves a version the database lacks.
+        """
+        version = db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(token_version=User.token_version + 1)
+            .returning(User.token_version)
+        ).scalar()
+        if commit:
+            db.commit()
+            self._store(user_id, version)
+            return version
+
+        def on_commit(session):
+            event.remove(db, "after_rollback", on_rollback)
+            self._store(user_id, version)
+
+        def on_rollback(session):
+            event.remove(db, "after_commit", on_commit)
+
+        event.listen(db, "after_commit", on_commit, once=True)
+        event.listen(db, "after_rollback", on_rollback, once=True)
+        return version
+
+    def _store(self, user_id: int, version: Optional[int]):
+        with self._lock:
+            if version is not None:
+                self._versions[user_id] = (version, time.monotonic())
+            self._counters["bumps"] += 1
+
+    def forget(self, user_id: int):
+        with self._lock:
+            self._versions.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._counters, "users": len(self._versions)}
+
+
+token_versions = TokenVersions(ttl_seconds=settings.token_version_ttl_seconds)
@@ -63,10 +63,15 @@ export class SPCRegL1DataService implements ISPCDataService<SPCRegL1> {
       });
 
       // Transform backend response to match DataResponse interface
-      // Backend returns array directly, not wrapped in object
+      // Backend returns the page as an array; totals come from response headers
+      const totalHeader = response.headers["x-total-count"];
       return {
         data: response.data || [],
-        total: response.data?.length || 0,
+        total:
+          totalHeader !== undefined
+            ? Number(totalHeader)
+            : response.data?.length || 0,
+        totalIsEstimate: response.headers["x-total-count-exact"] === "false",
         page: params.filterParams?.page || 1,
         pageSize: params.filterParams?.pageSize || 100,
       };
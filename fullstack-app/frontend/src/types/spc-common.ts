@@ -67,6 +67,8 @@ export interface FilterParams {
 export interface DataResponse<T> {
   data: T[];
   total: number;
+  // True when total is a planner estimate rather than an exact count
+  totalIsEstimate?: boolean;
   page: number;
   pageSize: number;
 }